@@ -0,0 +1,192 @@
+import hashlib
+import hmac
+import logging
+from math import ceil
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import SessionLocal
+from app.models import ApiKey
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("read", "admin")
+ROOT_KEY_NAME = "root"
+
+
+def hash_key(api_key: str) -> str:
+    """SHA-256 ключа в hex - в таком виде ключи хранятся в api_key"""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class KeyPolicy:
+    """Области доступа и ограничения одного ключа"""
+
+    __slots__ = ("name", "scopes", "rate_per_second", "burst", "max_concurrent")
+
+    def __init__(
+        self,
+        name: str,
+        scopes: frozenset[str],
+        rate_per_second: float | None = None,
+        burst: int | None = None,
+        max_concurrent: int | None = None,
+    ):
+        self.name = name
+        self.scopes = scopes
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+
+    @classmethod
+    def from_row(cls, row: ApiKey) -> "KeyPolicy":
+        return cls(
+            row.name,
+            frozenset(row.scopes.split()),
+            row.rate_per_second,
+            row.burst,
+            row.max_concurrent,
+        )
+
+
+class KeyStore:
+    """Ключи из таблицы api_key, закешированные в памяти
+
+    Список перечитывается из БД не чаще раза в ttl секунд, поэтому новый или
+    отозванный ключ начинает действовать с этой задержкой. Ключ из .env -
+    корневой: все области доступа и никаких ограничений.
+    """
+
+    def __init__(self, root_key: str, ttl: float):
+        self._root_key = root_key.encode()
+        self._root = KeyPolicy(ROOT_KEY_NAME, frozenset(SCOPES))
+        self._ttl = ttl
+        self._lock = Lock()
+        self._keys: dict[str, KeyPolicy] = {}
+        self._loaded_at: float | None = None
+
+    def authenticate(self, api_key: str | None) -> KeyPolicy | None:
+        """Возвращает политику ключа или None, если ключ неизвестен"""
+        if not api_key:
+            return None
+        if hmac.compare_digest(api_key.encode(), self._root_key):
+            return self._root
+        # Поиск идёт по SHA-256 ключа: время поиска в словаре не раскрывает
+        # сам ключ, а в памяти, как и в БД, нет открытых ключей
+        return self._current().get(hash_key(api_key))
+
+    def policies(self) -> list[KeyPolicy]:
+        return [self._root, *self._current().values()]
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def _current(self) -> dict[str, KeyPolicy]:
+        loaded_at = self._loaded_at
+        if loaded_at is None or monotonic() - loaded_at > self._ttl:
+            # Пока один поток перечитывает ключи, остальные работают со старым
+            # списком; ждут только запросы до первой загрузки
+            if self._lock.acquire(blocking=loaded_at is None):
+                try:
+                    if self._loaded_at == loaded_at:
+                        self._refresh()
+                finally:
+                    self._lock.release()
+        return self._keys
+
+    def _refresh(self) -> None:
+        try:
+            with SessionLocal() as db:
+                rows = db.query(ApiKey).filter(ApiKey.is_active.is_(True)).all()
+        except SQLAlchemyError:
+            logger.exception("Не удалось загрузить API-ключи, остаётся прежний список")
+        else:
+            self._keys = {row.key_hash: KeyPolicy.from_row(row) for row in rows}
+        self._loaded_at = monotonic()
+
+
+class KeyUsage:
+    """Состояние лимитов и счётчики использования одного ключа"""
+
+    __slots__ = (
+        "tokens",
+        "updated",
+        "in_flight",
+        "requests",
+        "rate_limited",
+        "concurrency_limited",
+    )
+
+    def __init__(self, tokens: float):
+        self.tokens = tokens
+        self.updated = monotonic()
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.concurrency_limited = 0
+
+
+class RateLimiter:
+    """Token bucket и ограничение одновременных запросов для каждого ключа"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._usage: dict[str, KeyUsage] = {}
+
+    @staticmethod
+    def _capacity(policy: KeyPolicy) -> float:
+        return float(policy.burst or max(1, ceil(policy.rate_per_second)))
+
+    def acquire(self, policy: KeyPolicy) -> float | None:
+        """Занимает слот запроса
+
+        Returns:
+            None, если запрос разрешён, иначе через сколько секунд повторить
+        """
+        with self._lock:
+            usage = self._usage.get(policy.name)
+            if usage is None:
+                tokens = self._capacity(policy) if policy.rate_per_second else 0.0
+                usage = self._usage[policy.name] = KeyUsage(tokens)
+
+            if (
+                policy.max_concurrent is not None
+                and usage.in_flight >= policy.max_concurrent
+            ):
+                usage.concurrency_limited += 1
+                return 1.0
+
+            if policy.rate_per_second:
+                now = monotonic()
+                usage.tokens = min(
+                    self._capacity(policy),
+                    usage.tokens + (now - usage.updated) * policy.rate_per_second,
+                )
+                usage.updated = now
+                if usage.tokens < 1:
+                    usage.rate_limited += 1
+                    return (1 - usage.tokens) / policy.rate_per_second
+                usage.tokens -= 1
+
+            usage.in_flight += 1
+            usage.requests += 1
+            return None
+
+    def release(self, policy: KeyPolicy) -> None:
+        with self._lock:
+            self._usage[policy.name].in_flight -= 1
+
+    def usage(self, name: str) -> dict:
+        with self._lock:
+            usage = self._usage.get(name) or KeyUsage(0.0)
+            return {
+                "in_flight": usage.in_flight,
+                "requests": usage.requests,
+                "rate_limited": usage.rate_limited,
+                "concurrency_limited": usage.concurrency_limited,
+            }
+
+
+rate_limiter = RateLimiter()
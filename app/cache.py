@@ -0,0 +1,95 @@
+from abc import ABC, abstractmethod
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.models import VERSIONED_TABLES, DataVersion
+
+_indexes: list["InMemoryIndex"] = []
+
+
+def table_versions(db: Session) -> dict[str, int]:
+    """Версии таблиц каталога из data_version
+
+    Читаются одним запросом по первичному ключу и запоминаются до конца
+    транзакции сессии: все индексы запроса сверяются с одним снимком
+    """
+    versions = db.info.get("table_versions")
+    if versions is None:
+        rows = db.execute(
+            select(DataVersion.table_name, DataVersion.version).where(
+                DataVersion.table_name.in_(VERSIONED_TABLES)
+            )
+        )
+        versions = db.info["table_versions"] = dict(rows.all())
+    return versions
+
+
+class InMemoryIndex(ABC):
+    """Базовый класс in-memory индекса, построенного по данным БД
+
+    Индекс строится при первом обращении и перестраивается, когда растёт
+    версия одной из таблиц `tables` в data_version. Версии увеличивают
+    триггеры БД, поэтому учитываются и записи других процессов и записи
+    в обход ORM.
+    """
+
+    tables: frozenset[str] = frozenset()
+    # Как часто (в секундах) процесс сверяется с data_version. При нуле
+    # версии читаются в каждом запросе; иначе индекс в течение интервала
+    # после сверки отвечает из памяти, не обращаясь к БД
+    recheck_interval: float = 0.0
+
+    def __init__(self):
+        self._lock = Lock()
+        # (версии таблиц, по которым построено состояние; состояние)
+        self._loaded: tuple[tuple[int, ...], object] | None = None
+        self._checked_at = float("-inf")
+        _indexes.append(self)
+
+    @abstractmethod
+    def load(self, db: Session):
+        """Строит новое состояние индекса"""
+
+    def _versions(self, db: Session) -> tuple[int, ...]:
+        versions = table_versions(db)
+        return tuple(versions.get(table, 0) for table in sorted(self.tables))
+
+    @staticmethod
+    def _fresh(loaded, versions: tuple[int, ...]) -> bool:
+        # Состояние, построенное по более новым версиям, тоже подходит:
+        # запрос мог прочитать версии чуть раньше другого потока
+        return loaded is not None and all(
+            built >= seen for built, seen in zip(loaded[0], versions)
+        )
+
+    def get(self, db: Session):
+        loaded = self._loaded
+        checked_at = monotonic()
+        if loaded is not None and checked_at - self._checked_at < self.recheck_interval:
+            return loaded[1]
+
+        versions = self._versions(db)
+        if self._fresh(loaded, versions):
+            self._checked_at = checked_at
+            return loaded[1]
+
+        with self._lock:
+            loaded = self._loaded
+            if not self._fresh(loaded, versions):
+                # Версии прочитаны до построения, поэтому состояние не старше их
+                loaded = self._loaded = (versions, self.load(db))
+            self._checked_at = checked_at
+            return loaded[1]
+
+
+def registered_indexes() -> list[InMemoryIndex]:
+    return list(_indexes)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_table_versions(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("table_versions", None)
@@ -0,0 +1,269 @@
+import json
+from itertools import chain
+
+from fastapi import Response
+from sqlalchemy import delete, event, inspect, lambda_stmt, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import LoaderCallableStatus, Session, joinedload, selectinload
+
+from app.models import (
+    Building,
+    Business,
+    Organization,
+    OrganizationBusiness,
+    OrganizationCard,
+    Phone,
+)
+from app.schemas import NormalizedOrganizationResponse, OrganizationResponse
+
+
+def render_cards(db: Session, org_ids) -> dict[int, tuple[bytes, bytes]]:
+    """Строит JSON существующих организаций: полный и в формате normalized"""
+    orgs = (
+        db.query(Organization)
+        .options(
+            joinedload(Organization.building),
+            joinedload(Organization.phones),
+            selectinload(Organization.businesses),
+        )
+        .filter(Organization.id.in_(org_ids))
+        .populate_existing()
+        .all()
+    )
+
+    cards = {}
+    for org in orgs:
+        card = OrganizationResponse.model_validate(org)
+        compact = NormalizedOrganizationResponse(
+            id=card.id,
+            name=card.name,
+            phones=card.phones,
+            building_id=card.building.id,
+            business_ids=[business.id for business in card.businesses],
+        )
+        cards[org.id] = (
+            card.model_dump_json().encode(),
+            compact.model_dump_json().encode(),
+        )
+    return cards
+
+
+def _store_cards(db: Session, cards: dict[int, tuple[bytes, bytes]]) -> None:
+    stmt = insert(OrganizationCard).values(
+        [
+            {"organization_id": id_, "payload": payload, "compact": compact}
+            for id_, (payload, compact) in cards.items()
+        ]
+    )
+    db.connection().execute(
+        stmt.on_conflict_do_update(
+            index_elements=[OrganizationCard.organization_id],
+            set_={"payload": stmt.excluded.payload, "compact": stmt.excluded.compact},
+        )
+    )
+
+
+def write_cards(db: Session, org_ids) -> dict[int, tuple[bytes, bytes]]:
+    """Перестраивает карточки организаций, удаляя карточки удалённых"""
+    org_ids = set(org_ids)
+    if not org_ids:
+        return {}
+
+    cards = render_cards(db, org_ids)
+    if cards:
+        _store_cards(db, cards)
+
+    missing = org_ids - cards.keys()
+    if missing:
+        db.connection().execute(
+            delete(OrganizationCard).where(
+                OrganizationCard.organization_id.in_(missing)
+            )
+        )
+    return cards
+
+
+def get_cards(db: Session, org_ids: list[int], compact: bool = False) -> list[bytes]:
+    """Возвращает карточки в порядке org_ids, пропуская несуществующие
+
+    Только читает БД: недостающие карточки (их удалили триггеры после записи
+    в обход ORM) строятся в памяти для этого ответа и не сохраняются, чтобы
+    чтения не брали блокировку записи SQLite. Сохраняет их прогрев при
+    запуске (app.warmup) или следующий коммит ORM, затронувший организацию.
+
+    Args:
+        compact: Вернуть карточки в формате normalized
+    """
+    if not org_ids:
+        return []
+
+    # Самый частый запрос приложения: lambda_stmt кеширует построенный
+    # запрос по коду лямбд, org_ids подставляется как параметр
+    if compact:
+        stmt = lambda_stmt(
+            lambda: select(
+                OrganizationCard.organization_id, OrganizationCard.compact
+            ).where(OrganizationCard.compact.is_not(None))
+        )
+    else:
+        stmt = lambda_stmt(
+            lambda: select(OrganizationCard.organization_id, OrganizationCard.payload)
+        )
+    stmt += lambda s: s.where(OrganizationCard.organization_id.in_(org_ids))
+    cards = dict(db.execute(stmt).all())
+
+    missing = set(org_ids) - cards.keys()
+    if missing:
+        rendered = render_cards(db, missing)
+        cards.update((id_, pair[compact]) for id_, pair in rendered.items())
+
+    return [cards[id_] for id_ in org_ids if id_ in cards]
+
+
+def card_response(payload: bytes) -> Response:
+    return Response(content=payload, media_type="application/json")
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def normalized_cards_json(db: Session, org_ids: list[int]) -> bytes:
+    """JSON NormalizedOrganizationListResponse
+
+    Организации склеиваются из сохранённых карточек compact. Списки зданий
+    и видов деятельности строятся по ссылкам из этих же карточек запросами
+    по первичному ключу, поэтому каждая ссылка в ответе разрешается
+    """
+    organizations = b",".join(get_cards(db, org_ids, compact=True))
+
+    # Один разбор склеенного массива быстрее, чем разбор каждой карточки
+    building_ids, business_ids = set(), set()
+    for card in json.loads(b"[" + organizations + b"]"):
+        building_ids.add(card["building_id"])
+        business_ids.update(card["business_ids"])
+
+    buildings, businesses = [], []
+    if building_ids:
+        rows = db.execute(
+            select(Building.id, Building.address, Building.latitude, Building.longitude)
+            .where(Building.id.in_(building_ids))
+            .order_by(Building.id)
+        )
+        buildings = [
+            {
+                "id": id_,
+                "address": address,
+                "latitude": float(lat),
+                "longitude": float(lon),
+            }
+            for id_, address, lat, lon in rows
+        ]
+    if business_ids:
+        rows = db.execute(
+            select(Business.id, Business.name, Business.parent_id)
+            .where(Business.id.in_(business_ids))
+            .order_by(Business.id)
+        )
+        businesses = [
+            {"id": id_, "name": name, "parent_id": parent_id}
+            for id_, name, parent_id in rows
+        ]
+
+    return (
+        b'{"organizations":['
+        + organizations
+        + b'],"buildings":'
+        + _dumps(buildings)
+        + b',"businesses":'
+        + _dumps(businesses)
+        + b"}"
+    )
+
+
+def cards_response(
+    db: Session, org_ids: list[int], response_format: str = "full"
+) -> Response:
+    """JSON-массив карточек, склеенный из сохранённых байтов
+
+    В формате normalized - NormalizedOrganizationListResponse
+    """
+    if response_format == "normalized":
+        return card_response(normalized_cards_json(db, org_ids))
+    return card_response(b"[" + b",".join(get_cards(db, org_ids)) + b"]")
+
+
+def cards_page_response(db: Session, org_ids: list[int], **fields) -> Response:
+    """Страница {"items": [карточки], **fields}, склеенная из сохранённых байтов"""
+    items = b",".join(get_cards(db, org_ids))
+    return card_response(b'{"items":[' + items + b"]," + _dumps(fields)[1:])
+
+
+def _pending(session) -> dict[str, set[int]]:
+    return session.info.setdefault(
+        "card_refresh",
+        {"organizations": set(), "buildings": set(), "businesses": set()},
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_card_changes(session, flush_context):
+    """Запоминает, чьи карточки нужно перестроить перед коммитом"""
+    pending = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(
+            obj, (Building, Business, Organization, OrganizationBusiness, Phone)
+        ):
+            continue
+        pending = pending or _pending(session)
+
+        if isinstance(obj, Organization):
+            pending["organizations"].add(obj.id)
+        elif isinstance(obj, (Phone, OrganizationBusiness)):
+            # Телефон могли перенести в другую организацию
+            history = inspect(obj).attrs.organization_id.history
+            pending["organizations"].update(
+                id_ for id_ in chain(history.sum(), [obj.organization_id]) if id_
+            )
+        elif isinstance(obj, Building):
+            pending["buildings"].add(obj.id)
+        elif obj in session.deleted:
+            # Связи удалённого вида деятельности уже удалены этим flush
+            loaded = inspect(obj).attrs.organizations.loaded_value
+            if loaded is not LoaderCallableStatus.NO_VALUE:
+                pending["organizations"].update(o.id for o in loaded)
+        else:
+            pending["businesses"].add(obj.id)
+
+
+@event.listens_for(Session, "before_commit")
+def refresh_cards(session):
+    """Перестраивает карточки затронутых организаций в той же транзакции"""
+    # commit() сбрасывает изменения уже после before_commit, поэтому
+    # flush здесь нужен, чтобы after_flush успел собрать изменения
+    session.flush()
+    pending = session.info.pop("card_refresh", None)
+    if not pending:
+        return
+
+    org_ids = pending["organizations"]
+    if pending["buildings"]:
+        org_ids.update(
+            id_
+            for (id_,) in session.query(Organization.id).filter(
+                Organization.building_id.in_(pending["buildings"])
+            )
+        )
+    if pending["businesses"]:
+        org_ids.update(
+            id_
+            for (id_,) in session.query(OrganizationBusiness.organization_id).filter(
+                OrganizationBusiness.business_id.in_(pending["businesses"])
+            )
+        )
+    write_cards(session, org_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_card_changes(session):
+    session.info.pop("card_refresh", None)
@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Session
+
+from app.models import ChangeLog
+
+
+def read_changes(db: Session, since: int, limit: int) -> tuple[list[ChangeLog], bool]:
+    """Возвращает изменения с номером больше since и признак наличия следующих
+
+    Журнал ведут триггеры БД (app.models.change_log_ddl), поэтому в нём
+    есть и записи в обход ORM
+    """
+    rows = (
+        db.query(ChangeLog)
+        .filter(ChangeLog.seq > since)
+        .order_by(ChangeLog.seq)
+        .limit(limit + 1)
+        .all()
+    )
+    return rows[:limit], len(rows) > limit
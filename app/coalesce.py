@@ -0,0 +1,120 @@
+from copy import copy
+from functools import wraps
+from threading import Event, Lock
+
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+from app.metrics import current_request, registry
+
+# Сколько секунд ждать чужой результат, прежде чем посчитать самому
+COALESCE_TIMEOUT = 5.0
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом
+
+    Первый вызов (ведущий) выполняет функцию, остальные ждут его результат
+    или исключение. Если ведущий не успел за timeout, ожидающий вызов
+    выполняет функцию сам - медленный запрос не блокирует остальные дольше
+    заданного времени.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls: dict[tuple, _Call] = {}
+
+    def do(self, key: tuple, func, timeout: float) -> tuple[object, bool]:
+        """Returns: результат и признак, что он получен от другого вызова"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(timeout):
+                return func(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+single_flight = SingleFlight()
+
+
+def _freeze(value):
+    if isinstance(value, (list, set, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _share(result):
+    """Копия ответа для каждого запроса: middleware меняют заголовки на месте"""
+    if isinstance(result, Response):
+        result = copy(result)
+        result.raw_headers = list(result.raw_headers)
+    return result
+
+
+def coalesce(timeout: float = COALESCE_TIMEOUT):
+    """Объединяет одновременные одинаковые запросы к эндпоинту
+
+    Ключ - эндпоинт и значения его параметров после валидации, поэтому
+    lat=55.750 и lat=55.75 считаются одним запросом. Сессии БД в ключ
+    не входят. Подходит только для эндпоинтов, которые читают данные и не
+    зависят от того, кто их вызвал.
+    """
+
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name,) + tuple(
+                sorted(
+                    (param, _freeze(value))
+                    for param, value in kwargs.items()
+                    if not isinstance(value, Session)
+                )
+            )
+            result, shared = single_flight.do(
+                key, lambda: func(*args, **kwargs), timeout
+            )
+            stats = current_request.get()
+            if shared and stats is not None:
+                registry.record(
+                    counters=[
+                        (
+                            "coalesced_requests_total",
+                            "Запросы, получившие результат одновременного такого же",
+                            (("method", stats.scope["method"]), ("route", stats.route)),
+                            1,
+                        )
+                    ]
+                )
+            return _share(result)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,182 @@
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.metrics import registry
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard - необязательная зависимость
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+# Кодировка -> функция сжатия, в порядке предпочтения сервера
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = zstandard.ZstdCompressor(level=3).compress
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=5)
+ENCODERS["gzip"] = _gzip
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Выбирает кодировку по заголовку Accept-Encoding
+
+    Из принятых клиентом (q > 0) берётся первая в порядке ENCODERS:
+    при равных весах сервер выбирает кодировку, сжимающую лучше.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    candidates = [
+        (accepted.get(encoding, wildcard), encoding)
+        for encoding in ENCODERS
+        if accepted.get(encoding, wildcard) > 0
+    ]
+    if not candidates:
+        return None
+    best = max(quality for quality, _ in candidates)
+    return next(encoding for quality, encoding in candidates if quality == best)
+
+
+class CompressedCache:
+    """LRU сжатых тел ответов по хешу исходного тела и кодировке
+
+    Ограничен суммарным размером сжатых данных. Используется только из
+    цикла событий, поэтому без блокировок.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._size = 0
+        self._entries: OrderedDict[tuple[bytes, str], bytes] = OrderedDict()
+
+    def get(self, key: tuple[bytes, str]) -> bytes | None:
+        payload = self._entries.get(key)
+        if payload is not None:
+            self._entries.move_to_end(key)
+        return payload
+
+    def put(self, key: tuple[bytes, str], payload: bytes) -> None:
+        if len(payload) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = payload
+        self._size += len(payload)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+
+compressed_cache = CompressedCache(
+    int(os.getenv("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024)))
+)
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: сжатие ответов по Accept-Encoding
+
+    Сжимаются ответы JSON и text/* от minimum_size байт, целиком
+    сформированные одним сообщением (потоковые пропускаются как есть).
+    Сжатые тела кешируются по хешу исходного: повторные ответы с теми же
+    данными (карточки организаций) не сжимаются заново.
+    """
+
+    def __init__(self, app, minimum_size: int | None = None):
+        self.app = app
+        self.minimum_size = (
+            minimum_size
+            if minimum_size is not None
+            else int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Заголовки отправляются вместе с телом, когда ясно, сжимать ли
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start)
+            if message.get("more_body") or not self._compressible(headers, body):
+                await send(start)
+                await send(message)
+                return
+
+            body = await self._compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _compressible(self, headers: MutableHeaders, body: bytes) -> bool:
+        return (
+            len(body) >= self.minimum_size
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        )
+
+    @staticmethod
+    async def _compress(body: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        payload = compressed_cache.get(key)
+        hit = payload is not None
+        if not hit:
+            payload = await run_in_threadpool(ENCODERS[encoding], body)
+            compressed_cache.put(key, payload)
+
+        registry.record(
+            counters=[
+                (
+                    "http_compression_total",
+                    "Сжатые ответы по кодировке и попаданию в кеш",
+                    (("encoding", encoding), ("cache", "hit" if hit else "miss")),
+                    1,
+                )
+            ]
+        )
+        return payload
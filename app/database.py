@@ -1,20 +1,44 @@
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from app.metrics import TimedQueuePool
+
 BASE_DIR = Path(__file__).parent.parent
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{BASE_DIR}/database.db"
 
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=TimedQueuePool,
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
+def _unicode_lower(value: str | None) -> str | None:
+    return value.lower() if value is not None else None
+
+
+@event.listens_for(engine, "connect")
+def register_sqlite_functions(dbapi_connection, connection_record):
+    """Регистрирует функции, которых нет во встроенном наборе SQLite
+
+    lower() в SQLite понимает только ASCII, поэтому для кириллицы
+    используется py_lower(). haversine() позволяет фильтровать по кругу
+    прямо в запросе, без выгрузки зданий в Python.
+    """
+    from app.utils import haversine_distance
+
+    dbapi_connection.create_function("py_lower", 1, _unicode_lower, deterministic=True)
+    dbapi_connection.create_function(
+        "haversine", 4, haversine_distance, deterministic=True
+    )
+
+
 def get_db():
     db = SessionLocal()
     try:
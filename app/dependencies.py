@@ -1,11 +1,14 @@
 import os
+from math import ceil
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import HTTPException, Security
+from fastapi import Depends, HTTPException, Query, Security, status
 from fastapi.security import APIKeyHeader
 from starlette.status import HTTP_403_FORBIDDEN
 
+from app.api_keys import KeyPolicy, KeyStore, rate_limiter
+
 # Загружаем .env
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(env_path)
@@ -18,8 +21,79 @@ API_KEY_NAME = "X-API-Key"
 
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
+# API_KEY из .env - корневой ключ, остальные хранятся в таблице api_key
+key_store = KeyStore(API_KEY, ttl=float(os.getenv("API_KEY_CACHE_TTL", "60")))
+
 
 def verify_api_key(api_key: str = Security(api_key_header)):
-    if api_key != API_KEY:
+    """Проверяет ключ и занимает слот в его лимитах до конца запроса
+
+    Зависимость подключается к роутерам в main.py (к роутерам каталога -
+    через require_scope("read")) и выполняется раньше get_db, поэтому
+    отклонённый по лимиту запрос не открывает сессию БД
+    """
+    key = key_store.authenticate(api_key)
+    if key is None:
         raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="Invalid API Key")
-    return api_key
+
+    retry_after = rate_limiter.acquire(key)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Превышен лимит запросов для API-ключа",
+            headers={"Retry-After": str(ceil(retry_after))},
+        )
+
+    try:
+        yield key
+    finally:
+        rate_limiter.release(key)
+
+
+def require_scope(scope: str):
+    """Зависимость, пропускающая только ключи с областью доступа scope"""
+
+    def check_scope(key: KeyPolicy = Depends(verify_api_key)) -> KeyPolicy:
+        if scope not in key.scopes:
+            raise HTTPException(
+                status_code=HTTP_403_FORBIDDEN,
+                detail=f"Для запроса нужна область доступа {scope}",
+            )
+        return key
+
+    return check_scope
+
+
+def get_geo_area(
+    lat: float | None = Query(None, ge=-90, le=90, description="Широта центра"),
+    lon: float | None = Query(None, ge=-180, le=180, description="Долгота центра"),
+    radius: float | None = Query(
+        None, gt=0, le=100_000, description="Радиус в метрах (макс. 100 км)"
+    ),
+    shape: str = Query(
+        "circle", pattern="^(circle|square)$", description="Форма области"
+    ),
+) -> tuple[float, float, float, str] | None:
+    """Необязательная область на карте: (lat, lon, radius, shape) или None"""
+    geo_params = (lat, lon, radius)
+    if all(p is None for p in geo_params):
+        return None
+    if None in geo_params:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Для поиска по области нужны lat, lon и radius",
+        )
+    return lat, lon, radius, shape
+
+
+def get_response_format(
+    response_format: str = Query(
+        "full",
+        alias="format",
+        pattern="^(full|normalized)$",
+        description="full - полные организации, normalized - здания и виды "
+        "деятельности отдельными списками, организации ссылаются на них по ID",
+    ),
+) -> str:
+    """Формат списка организаций"""
+    return response_format
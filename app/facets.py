@@ -0,0 +1,132 @@
+from sqlalchemy.orm import Session
+
+from app.cache import InMemoryIndex
+from app.models import Building, Business, Organization, OrganizationBusiness
+from app.utils import bounding_box, haversine_distance
+
+
+class CatalogRollup(InMemoryIndex):
+    """In-memory свёртка каталога для подсчёта организаций
+
+    Хранит для каждой организации здание, название и виды деятельности
+    вместе со всеми их предками, а также готовые счётчики без фильтров.
+    Отфильтрованные счётчики считаются по этой свёртке без обращения к БД.
+    """
+
+    tables = frozenset(
+        {"building", "business", "organization", "organization_business"}
+    )
+
+    def load(self, db: Session) -> dict:
+        businesses = {
+            id_: (name, parent_id)
+            for id_, name, parent_id in db.query(
+                Business.id, Business.name, Business.parent_id
+            )
+        }
+        buildings = {
+            id_: (address, float(lat), float(lon))
+            for id_, address, lat, lon in db.query(
+                Building.id, Building.address, Building.latitude, Building.longitude
+            )
+        }
+        organizations = {
+            id_: (name, building_id)
+            for id_, name, building_id in db.query(
+                Organization.id, Organization.name, Organization.building_id
+            )
+        }
+
+        # Вид деятельности -> он сам и все его предки
+        lineage = {}
+        for business_id in businesses:
+            chain = []
+            current = business_id
+            while current is not None and current not in chain:
+                chain.append(current)
+                current = businesses[current][1]
+            lineage[business_id] = tuple(chain)
+
+        org_businesses = {org_id: [] for org_id in organizations}
+        for org_id, business_id in db.query(
+            OrganizationBusiness.organization_id, OrganizationBusiness.business_id
+        ):
+            if org_id in org_businesses and business_id in lineage:
+                org_businesses[org_id].append(business_id)
+
+        state = {
+            "businesses": businesses,
+            "buildings": buildings,
+            "organizations": organizations,
+            "org_businesses": org_businesses,
+            "lineage": lineage,
+        }
+        state["totals"] = _count(state, organizations)
+        return state
+
+
+def _count(state: dict, org_ids) -> dict:
+    """Считает организации по видам деятельности и зданиям"""
+    direct = {}
+    subtree = {}
+    per_building = {}
+    for org_id in org_ids:
+        building_id = state["organizations"][org_id][1]
+        per_building[building_id] = per_building.get(building_id, 0) + 1
+
+        # Организация учитывается в предке один раз, даже если относится
+        # к нескольким его подвидам
+        ancestors = set()
+        for business_id in state["org_businesses"][org_id]:
+            direct[business_id] = direct.get(business_id, 0) + 1
+            ancestors.update(state["lineage"][business_id])
+        for business_id in ancestors:
+            subtree[business_id] = subtree.get(business_id, 0) + 1
+
+    return {"direct": direct, "subtree": subtree, "buildings": per_building}
+
+
+catalog_rollup = CatalogRollup()
+
+
+def get_catalog_counts(
+    db: Session,
+    name: str | None = None,
+    area: tuple[float, float, float, str] | None = None,
+) -> tuple[dict, dict]:
+    """Возвращает состояние свёртки и счётчики с учётом фильтров
+
+    Args:
+        name: Часть названия организации (регистронезависимо)
+        area: Область (lat, lon, radius, shape)
+
+    Returns:
+        (состояние свёртки, счётчики)
+    """
+    state = catalog_rollup.get(db)
+    if name is None and area is None:
+        return state, state["totals"]
+
+    building_ids = None
+    if area is not None:
+        lat, lon, radius, shape = area
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
+        building_ids = {
+            id_
+            for id_, (_, b_lat, b_lon) in state["buildings"].items()
+            if min_lat <= b_lat <= max_lat
+            and min_lon <= b_lon <= max_lon
+            and (
+                shape == "square"
+                or haversine_distance(lat, lon, b_lat, b_lon) <= radius
+            )
+        }
+
+    search_term = name.lower() if name else None
+    org_ids = [
+        org_id
+        for org_id, (org_name, building_id) in state["organizations"].items()
+        if (building_ids is None or building_id in building_ids)
+        and (search_term is None or search_term in org_name.lower())
+    ]
+    return state, _count(state, org_ids)
@@ -0,0 +1,228 @@
+import heapq
+from collections import Counter
+from math import ceil
+
+from sqlalchemy import ColumnElement, column, func, select, table
+from sqlalchemy.orm import Session
+
+from app.cache import InMemoryIndex
+from app.models import Organization
+from app.utils import normalize_name
+
+# Доля триграмм запроса, которая должна встретиться в названии
+MIN_OVERLAP_RATIO = 0.3
+# Сколько кандидатов с наибольшим пересечением проверяется расстоянием
+MAX_CANDIDATES = 100
+MAX_RESULTS = 50
+# Триграммы, встречающиеся чаще, чем в этой доле названий ("ооо", " ип"),
+# почти не отсеивают кандидатов, но дороже всего при подсчёте пересечений
+COMMON_TRIGRAM_RATIO = 0.05
+COMMON_TRIGRAM_MIN = 1000
+# Самый короткий запрос, который ищется по FTS5: короче нет ни одной триграммы
+MIN_FTS_QUERY = 3
+
+# FTS5-индекс названий (app.models.ORGANIZATION_NAME_FTS_DDL)
+organization_name_fts = table("organization_name_fts", column("rowid"), column("name"))
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы слов текста, слова дополняются пробелами как в pg_trgm"""
+    result = set()
+    for word in text.split():
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def build_trigram_state(
+    rows,
+) -> tuple[dict[str, list[int]], dict[int, str]]:
+    """Строит инвертированный индекс по парам (id, название)"""
+    postings = {}
+    names = {}
+    for org_id, name in rows:
+        normalized = normalize_name(name)
+        names[org_id] = normalized
+        for trigram in trigrams(normalized):
+            postings.setdefault(trigram, []).append(org_id)
+    return postings, names
+
+
+def bounded_substring_distance(
+    pattern: str, text: str, max_distance: int
+) -> int | None:
+    """Минимальное расстояние Левенштейна от pattern до подстроки text
+
+    Считается по столбцам с отсечением Укконена: строки матрицы ниже
+    последней со значением <= max_distance не вычисляются.
+
+    Returns:
+        Расстояние или None, если оно больше max_distance
+    """
+    m = len(pattern)
+    if m <= max_distance:
+        return m if not text else _substring_distance(pattern, text)
+
+    limit = max_distance + 1
+    column = list(range(m + 1))
+    last_active = max_distance
+    best = limit
+
+    for char in text:
+        top = min(last_active + 1, m)
+        if top > last_active:
+            column[top] = limit
+        diagonal = 0
+        for i in range(1, top + 1):
+            cost = 0 if pattern[i - 1] == char else 1
+            value = min(column[i] + 1, column[i - 1] + 1, diagonal + cost)
+            diagonal, column[i] = column[i], value
+
+        last_active = top
+        while column[last_active] > max_distance:
+            last_active -= 1
+
+        if last_active == m:
+            best = min(best, column[m])
+            if best == 0:
+                return 0
+
+    return best if best <= max_distance else None
+
+
+def _substring_distance(pattern: str, text: str) -> int:
+    column = list(range(len(pattern) + 1))
+    best = column[-1]
+    for char in text:
+        diagonal = 0
+        for i in range(1, len(pattern) + 1):
+            cost = 0 if pattern[i - 1] == char else 1
+            value = min(column[i] + 1, column[i - 1] + 1, diagonal + cost)
+            diagonal, column[i] = column[i], value
+        best = min(best, column[-1])
+    return best
+
+
+def substring_candidates(
+    postings: dict[str, list[int]], names: dict[int, str], query: str
+) -> list[int]:
+    """ID организаций, нормализованное название которых содержит запрос
+
+    Каждая триграмма внутри слова запроса есть и в названии, поэтому
+    кандидаты - пересечение их списков. Запрос из слов короче трёх символов
+    проверяется по всем названиям.
+    """
+    normalized = normalize_name(query)
+    query_trigrams = {
+        word[i : i + 3] for word in normalized.split() for i in range(len(word) - 2)
+    }
+    if query_trigrams:
+        lists = sorted((postings.get(t, ()) for t in query_trigrams), key=len)
+        candidates = set(lists[0])
+        for org_ids in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(org_ids)
+    else:
+        candidates = names
+
+    return sorted(org_id for org_id in candidates if normalized in names[org_id])
+
+
+def max_edits(query: str) -> int:
+    """Допустимое число опечаток: одна на каждые четыре символа, не больше двух"""
+    return min(2, max(1, len(query) // 4))
+
+
+def rank_candidates(
+    postings: dict[str, list[int]], names: dict[int, str], query: str
+) -> list[int]:
+    """Отбирает кандидатов по триграммам и сортирует по расстоянию"""
+    normalized = normalize_name(query)
+    query_trigrams = trigrams(normalized)
+    if not query_trigrams:
+        return []
+
+    # Частые триграммы пропускаются, если остаются более редкие
+    common = max(COMMON_TRIGRAM_MIN, int(len(names) * COMMON_TRIGRAM_RATIO))
+    selective = [t for t in query_trigrams if len(postings.get(t, ())) <= common]
+    used = selective or list(query_trigrams)
+
+    overlap = Counter()
+    for trigram in used:
+        overlap.update(postings.get(trigram, ()))
+
+    min_overlap = max(1, ceil(len(used) * MIN_OVERLAP_RATIO))
+    candidates = heapq.nlargest(
+        MAX_CANDIDATES,
+        ((count, org_id) for org_id, count in overlap.items() if count >= min_overlap),
+    )
+
+    allowed = max_edits(normalized)
+    ranked = []
+    for count, org_id in candidates:
+        distance = bounded_substring_distance(normalized, names[org_id], allowed)
+        if distance is not None:
+            ranked.append((distance, -count, len(names[org_id]), org_id))
+
+    ranked.sort()
+    return [org_id for *_, org_id in ranked[:MAX_RESULTS]]
+
+
+class TrigramIndex(InMemoryIndex):
+    """Инвертированный индекс триграмм нормализованных названий организаций"""
+
+    tables = frozenset({"organization"})
+
+    def load(self, db: Session) -> tuple[dict[str, list[int]], dict[int, str]]:
+        return build_trigram_state(db.query(Organization.id, Organization.name))
+
+
+trigram_index = TrigramIndex()
+
+
+def substring_filter(db: Session, query: str) -> ColumnElement[bool]:
+    """Условие на Organization.id: кандидаты для поиска по подстроке
+
+    Запрос от трёх символов ищется в FTS5-индексе названий в самой БД:
+    его ведут триггеры, поэтому в нём есть и строки, записанные в обход
+    приложения. Для более коротких запросов триграмм нет, и кандидаты
+    берутся из in-memory индекса, сверенного с data_version. Кандидатов
+    может быть больше, чем совпадений: точное совпадение проверяется
+    отдельно по py_lower(name).
+    """
+    if len(query) >= MIN_FTS_QUERY:
+        # Фраза в кавычках - подстрока целиком, кавычки внутри удваиваются
+        phrase = '"' + query.replace('"', '""') + '"'
+        return Organization.id.in_(
+            select(organization_name_fts.c.rowid).where(
+                organization_name_fts.c.name.match(phrase)
+            )
+        )
+
+    postings, names = trigram_index.get(db)
+    return Organization.id.in_(substring_candidates(postings, names, query))
+
+
+def substring_search_ids(db: Session, query: str) -> list[int]:
+    """Возвращает ID организаций, название которых содержит запрос
+
+    Кандидаты отбираются по индексу (substring_filter), а точное совпадение
+    без учёта регистра проверяется в БД поиском по первичному ключу - без
+    сканирования таблицы organization.
+    """
+    org_ids = (
+        db.query(Organization.id)
+        .filter(
+            substring_filter(db, query),
+            func.instr(func.py_lower(Organization.name), query.lower()) > 0,
+        )
+        .order_by(Organization.id)
+    )
+    return [org_id for (org_id,) in org_ids]
+
+
+def fuzzy_search_ids(db: Session, query: str) -> list[int]:
+    """Возвращает ID организаций, похожих на запрос, от лучшего к худшему"""
+    postings, names = trigram_index.get(db)
+    return rank_candidates(postings, names, query)
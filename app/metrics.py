@@ -0,0 +1,267 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин в формате Prometheus"""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Счётчики и гистограммы с метками, общие для всех потоков"""
+
+    def __init__(self):
+        self._lock = Lock()
+        # имя -> (тип, описание, {метки: значение})
+        self._families = {}
+
+    def _family(self, name: str, kind: str, help_text: str) -> dict:
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, help_text, {})
+        return family[2]
+
+    def record(self, counters: list[tuple] = (), histograms: list[tuple] = ()):
+        """Обновляет метрики под одной блокировкой
+
+        Args:
+            counters: (имя, описание, метки, прирост)
+            histograms: (имя, описание, границы, метки, значение)
+        """
+        with self._lock:
+            for name, help_text, labels, value in counters:
+                series = self._family(name, "counter", help_text)
+                series[labels] = series.get(labels, 0) + value
+            for name, help_text, buckets, labels, value in histograms:
+                series = self._family(name, "histogram", help_text)
+                histogram = series.get(labels)
+                if histogram is None:
+                    histogram = series[labels] = Histogram(buckets)
+                histogram.observe(value)
+
+    def render(self) -> str:
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, series) in sorted(self._families.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series.items()):
+                    if kind == "counter":
+                        lines.append(f"{name}{_labels(labels)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        le = labels + (("le", str(bound)),)
+                        lines.append(f"{name}_bucket{_labels(le)} {cumulative}")
+                    le = labels + (("le", "+Inf"),)
+                    lines.append(f"{name}_bucket{_labels(le)} {value.count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+registry = MetricsRegistry()
+
+
+class RequestStats:
+    """Статистика БД в рамках одного HTTP-запроса"""
+
+    __slots__ = ("scope", "statements", "db_time", "pool_wait")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+
+    @property
+    def route(self) -> str:
+        """Шаблон маршрута; известен после того, как роутер выбрал эндпоинт"""
+        route = self.scope.get("route")
+        return route.path if route is not None else "<unmatched>"
+
+
+# Обработчик синхронного эндпоинта выполняется в пуле потоков с копией
+# контекста, поэтому изменения объекта видны middleware
+current_request: ContextVar[RequestStats | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool, замеряющий время получения соединения из пула"""
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        finally:
+            elapsed = perf_counter() - start
+            stats = current_request.get()
+            if stats is not None:
+                stats.pool_wait += elapsed
+            registry.record(
+                histograms=[
+                    (
+                        "db_pool_checkout_seconds",
+                        "Время получения соединения из пула",
+                        DB_TIME_BUCKETS,
+                        (),
+                        elapsed,
+                    )
+                ]
+            )
+
+
+def install_sql_instrumentation(engine, observers=()) -> None:
+    """Подключает к движку общий таймер SQL-запросов
+
+    Время запроса замеряется один раз: по нему считаются запросы и время БД
+    текущего HTTP-запроса, и оно же передаётся наблюдателям
+    observer(cursor, statement, parameters, executemany, elapsed)
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_start_time"].pop()
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_time += elapsed
+        for observer in observers:
+            observer(cursor, statement, parameters, executemany, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_timer(exception_context):
+        # Для упавшего запроса after_cursor_execute не вызывается, и без этого
+        # время начала оставалось бы в info соединения, вернувшегося в пул
+        conn = exception_context.connection
+        if exception_context.execution_context is not None and conn is not None:
+            started = conn.info.get("query_start_time")
+            if started:
+                started.pop()
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: количество, длительность и размер ответов по шаблону маршрута"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        start = perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            labels = (("method", scope["method"]), ("route", stats.route))
+            _record_request(labels, status_code, perf_counter() - start, size, stats)
+
+
+def _record_request(labels, status_code, duration, size, stats) -> None:
+    registry.record(
+        counters=[
+            (
+                "http_requests_total",
+                "Количество HTTP-запросов",
+                labels + (("status", status_code),),
+                1,
+            ),
+            (
+                "db_statements_total",
+                "Количество SQL-запросов",
+                labels,
+                stats.statements,
+            ),
+        ],
+        histograms=[
+            (
+                "http_request_duration_seconds",
+                "Длительность обработки запроса",
+                LATENCY_BUCKETS,
+                labels,
+                duration,
+            ),
+            (
+                "http_response_size_bytes",
+                "Размер тела ответа",
+                SIZE_BUCKETS,
+                labels,
+                size,
+            ),
+            (
+                "db_statements_per_request",
+                "SQL-запросов на один HTTP-запрос",
+                STATEMENT_BUCKETS,
+                labels,
+                stats.statements,
+            ),
+            (
+                "db_time_per_request_seconds",
+                "Суммарное время SQL-запросов на один HTTP-запрос",
+                DB_TIME_BUCKETS,
+                labels,
+                stats.db_time,
+            ),
+            (
+                "db_pool_wait_per_request_seconds",
+                "Ожидание соединений из пула на один HTTP-запрос",
+                DB_TIME_BUCKETS,
+                labels,
+                stats.pool_wait,
+            ),
+        ],
+    )
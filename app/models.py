@@ -1,14 +1,21 @@
 from sqlalchemy import (
+    DDL,
     DECIMAL,
+    Boolean,
     CheckConstraint,
     Column,
+    DateTime,
+    Float,
     ForeignKey,
     Index,
     Integer,
+    LargeBinary,
     String,
+    Text,
     UniqueConstraint,
+    event,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 
 from app.database import Base
 
@@ -55,6 +62,7 @@ class Phone(Base):
     __tablename__ = "phone"
     id = Column(Integer, primary_key=True)
     number = Column(String(25), nullable=False)
+    normalized_number = Column(String(25), nullable=False)
     organization_id = Column(
         Integer,
         ForeignKey("organization.id", ondelete="CASCADE"),
@@ -65,8 +73,16 @@ class Phone(Base):
 
     __table_args__ = (
         UniqueConstraint("number", "organization_id", name="uq_number_organization"),
+        Index("idx_phone_normalized_number", "normalized_number"),
     )
 
+    @validates("number")
+    def validate_number(self, key, number):
+        from app.utils import normalize_phone
+
+        self.normalized_number = normalize_phone(number)
+        return number
+
 
 class Business(Base):
     __tablename__ = "business"
@@ -95,3 +111,216 @@ class OrganizationBusiness(Base):
     )
 
     __table_args__ = (Index("idx_org_business_business", "business_id"),)
+
+
+class OrganizationCard(Base):
+    __tablename__ = "organization_card"
+    organization_id = Column(
+        Integer, ForeignKey("organization.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Готовый JSON OrganizationResponse в UTF-8
+    payload = Column(LargeBinary, nullable=False)
+    # JSON NormalizedOrganizationResponse: ссылки на здание и виды деятельности
+    compact = Column(LargeBinary)
+
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String(32), nullable=False)
+    entity_id = Column(String(64), nullable=False)
+    operation = Column(String(8), nullable=False)
+    payload = Column(Text, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+
+    # AUTOINCREMENT: номера не переиспользуются после удаления строк
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class ApiKey(Base):
+    __tablename__ = "api_key"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False, unique=True)
+    # SHA-256 ключа в hex, сам ключ не хранится
+    key_hash = Column(String(64), nullable=False, unique=True)
+    # Области доступа через пробел: "read admin"
+    scopes = Column(String(255), nullable=False, default="read")
+    # Ограничения; NULL - без ограничения
+    rate_per_second = Column(Float)
+    burst = Column(Integer)
+    max_concurrent = Column(Integer)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+    table_name = Column(String(64), primary_key=True)
+    # Увеличивается триггером при каждой записи в таблицу table_name
+    version = Column(Integer, nullable=False, default=0)
+
+
+# Таблицы каталога, версии которых ведёт data_version
+VERSIONED_TABLES = (
+    "building",
+    "business",
+    "organization",
+    "organization_business",
+    "phone",
+)
+
+
+def data_version_ddl() -> list[str]:
+    """Строки data_version и триггеры, увеличивающие версию таблицы
+
+    Триггеры живут в БД, поэтому срабатывают и при записи в обход
+    приложения: из sqlite3, скриптов и других процессов
+    """
+    statements = [
+        "INSERT OR IGNORE INTO data_version (table_name, version) VALUES "
+        + ", ".join(f"('{table}', 0)" for table in VERSIONED_TABLES)
+    ]
+    for table in VERSIONED_TABLES:
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_version "
+                f"AFTER {operation} ON {table} BEGIN "
+                f"UPDATE data_version SET version = version + 1 "
+                f"WHERE table_name = '{table}'; END"
+            )
+    return statements
+
+
+for _statement in data_version_ddl():
+    event.listen(Base.metadata, "after_create", DDL(_statement))
+
+
+# (таблица, событие, организации, чьи карточки меняет запись)
+CARD_SOURCES = (
+    ("organization", "AFTER UPDATE", "OLD.id"),
+    ("organization", "AFTER DELETE", "OLD.id"),
+    ("phone", "AFTER INSERT", "NEW.organization_id"),
+    ("phone", "AFTER UPDATE", "OLD.organization_id, NEW.organization_id"),
+    ("phone", "AFTER DELETE", "OLD.organization_id"),
+    ("organization_business", "AFTER INSERT", "NEW.organization_id"),
+    (
+        "organization_business",
+        "AFTER UPDATE",
+        "OLD.organization_id, NEW.organization_id",
+    ),
+    ("organization_business", "AFTER DELETE", "OLD.organization_id"),
+    (
+        "building",
+        "AFTER UPDATE",
+        "SELECT id FROM organization WHERE building_id = OLD.id",
+    ),
+    (
+        "business",
+        "AFTER UPDATE",
+        "SELECT organization_id FROM organization_business WHERE business_id = OLD.id",
+    ),
+    # BEFORE: каскад внешнего ключа удаляет связи раньше триггеров AFTER
+    (
+        "business",
+        "BEFORE DELETE",
+        "SELECT organization_id FROM organization_business WHERE business_id = OLD.id",
+    ),
+)
+
+
+def card_invalidation_ddl() -> list[str]:
+    """Триггеры, удаляющие карточки организаций, затронутых записью
+
+    При записи через ORM карточки тут же перестраивает app.cards в той же
+    транзакции. Запись в обход ORM карточку не перестроит, но и устаревшей
+    её не оставит: недостающую карточку чтение строит по таблицам.
+    """
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_{timing.split()[1].lower()}_card "
+        f"{timing} ON {table} BEGIN "
+        f"DELETE FROM organization_card WHERE organization_id IN ({org_ids}); END"
+        for table, timing, org_ids in CARD_SOURCES
+    ]
+
+
+for _statement in card_invalidation_ddl():
+    event.listen(Base.metadata, "after_create", DDL(_statement))
+
+
+# Полнотекстовый индекс названий для поиска по подстроке: токенизатор
+# trigram находит любую подстроку от трёх символов без учёта регистра
+# (в том числе кириллицы). External content - тексты берутся из organization,
+# индекс ведут триггеры
+ORGANIZATION_NAME_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS organization_name_fts USING fts5("
+    "name, content='organization', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS organization_insert_name_fts "
+    "AFTER INSERT ON organization BEGIN "
+    "INSERT INTO organization_name_fts (rowid, name) VALUES (NEW.id, NEW.name); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS organization_delete_name_fts "
+    "AFTER DELETE ON organization BEGIN "
+    "INSERT INTO organization_name_fts (organization_name_fts, rowid, name) "
+    "VALUES ('delete', OLD.id, OLD.name); END",
+    "CREATE TRIGGER IF NOT EXISTS organization_update_name_fts "
+    "AFTER UPDATE OF id, name ON organization BEGIN "
+    "INSERT INTO organization_name_fts (organization_name_fts, rowid, name) "
+    "VALUES ('delete', OLD.id, OLD.name); "
+    "INSERT INTO organization_name_fts (rowid, name) VALUES (NEW.id, NEW.name); "
+    "END",
+    # Для таблиц, созданных раньше индекса, он строится заново
+    "INSERT INTO organization_name_fts (organization_name_fts) VALUES ('rebuild')",
+]
+
+for _statement in ORGANIZATION_NAME_FTS_DDL:
+    event.listen(Base.metadata, "after_create", DDL(_statement))
+
+
+def _change_log_insert(
+    table_name: str, keys: list[str], row: str, operation: str, names: list[str]
+) -> str:
+    entity_id = " || ':' || ".join(f"{row}.{key}" for key in keys)
+    payload = ", ".join(f"'{name}', {row}.{name}" for name in names)
+    return (
+        "INSERT INTO change_log (entity, entity_id, operation, payload, changed_at) "
+        f"SELECT '{table_name}', {entity_id}, '{operation}', json_object({payload}), "
+        "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    )
+
+
+def change_log_ddl() -> list[str]:
+    """Триггеры, записывающие изменения таблиц каталога в change_log
+
+    upsert несёт строку целиком, delete - только ключ; изменение ключа
+    записывается как delete старого ключа и upsert нового. Триггеры
+    срабатывают при любой записи: через ORM, в обход него, при каскадах
+    внешних ключей и при удалении связей, которое ORM делает сам
+    """
+    statements = []
+    for table_name in VERSIONED_TABLES:
+        table = Base.metadata.tables[table_name]
+        keys = [column.name for column in table.primary_key]
+        columns = [column.name for column in table.columns]
+        key_changed = " OR ".join(f"OLD.{key} IS NOT NEW.{key}" for key in keys)
+        bodies = {
+            "INSERT": [_change_log_insert(table_name, keys, "NEW", "upsert", columns)],
+            "UPDATE": [
+                _change_log_insert(table_name, keys, "OLD", "delete", keys)
+                + f" WHERE {key_changed}",
+                _change_log_insert(table_name, keys, "NEW", "upsert", columns),
+            ],
+            "DELETE": [_change_log_insert(table_name, keys, "OLD", "delete", keys)],
+        }
+        for operation, inserts in bodies.items():
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {table_name}_{operation.lower()}_change "
+                f"AFTER {operation} ON {table_name} BEGIN "
+                + "".join(f"{insert}; " for insert in inserts)
+                + "END"
+            )
+    return statements
+
+
+# DDL подставляет контекст через %, поэтому % из strftime удваивается
+for _statement in change_log_ddl():
+    event.listen(Base.metadata, "after_create", DDL(_statement.replace("%", "%%")))
@@ -0,0 +1,239 @@
+import inspect
+import sys
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+from threading import Lock
+from time import perf_counter, perf_counter_ns
+from urllib.parse import parse_qs
+
+from fastapi import Response
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+
+from app.dependencies import API_KEY_NAME, key_store
+from app.metrics import current_request
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Категория определяется по ближайшему к вершине стека кадру из списка
+CATEGORIES = (
+    ("sql", ("sqlite3", "sqlalchemy.engine", "sqlalchemy.pool", "sqlalchemy.dialects")),
+    (
+        "serialization",
+        ("pydantic", "json", "app.profiling:_profiled_endpoint.<locals>.serialize"),
+    ),
+    ("orm", ("sqlalchemy",)),
+)
+
+
+class StackProfiler:
+    """Детерминированный профайлер текущего потока со свёрнутыми стеками
+
+    Собственное время каждого стека копится в формате, который понимают
+    flamegraph.pl и speedscope: "кадр;кадр;кадр <микросекунды>"
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._last = 0
+        self.samples = Counter()
+
+    def _callback(self, frame, event, arg):
+        now = perf_counter_ns()
+        if self._stack:
+            self.samples[tuple(self._stack)] += now - self._last
+
+        if event == "call":
+            code = frame.f_code
+            self._stack.append(f"{frame.f_globals.get('__name__')}:{code.co_qualname}")
+        elif event == "c_call":
+            owner = getattr(arg, "__self__", None)
+            module = arg.__module__ or (
+                type(owner).__module__ if owner is not None else ""
+            )
+            self._stack.append(f"{module}:{arg.__qualname__}")
+        elif self._stack:
+            # return, c_return, c_exception
+            self._stack.pop()
+
+        self._last = perf_counter_ns()
+
+    def run(self, func, *args, **kwargs):
+        self._stack = []
+        self._last = perf_counter_ns()
+        sys.setprofile(self._callback)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.setprofile(None)
+
+    def folded(self) -> str:
+        return "\n".join(
+            f"{';'.join(stack)} {ns // 1000}"
+            for stack, ns in sorted(self.samples.items())
+            if ns >= 1000
+        )
+
+    def breakdown(self) -> dict[str, float]:
+        """Собственное время по категориям в миллисекундах"""
+        totals = dict.fromkeys([name for name, _ in CATEGORIES] + ["app"], 0.0)
+        for stack, ns in self.samples.items():
+            totals[_categorize(stack)] += ns / 1_000_000
+        return {name: round(value, 3) for name, value in totals.items()}
+
+
+def _categorize(stack: tuple[str, ...]) -> str:
+    for frame in reversed(stack):
+        for name, prefixes in CATEGORIES:
+            if frame.startswith(prefixes):
+                return name
+    return "app"
+
+
+class ProfileStore:
+    """Последние профили запросов"""
+
+    def __init__(self, size: int = 20):
+        self._lock = Lock()
+        self._profiles = deque(maxlen=size)
+
+    def add(self, profile: dict) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str) -> dict | None:
+        with self._lock:
+            return next((p for p in self._profiles if p["id"] == profile_id), None)
+
+
+profile_store = ProfileStore()
+
+# Профайлер запроса; None, если профилирование не запрошено
+current_profiler: ContextVar[StackProfiler | None] = ContextVar(
+    "current_profiler", default=None
+)
+
+
+def _profiled_endpoint(call, route: APIRoute):
+    adapter = None
+
+    def serialize(result):
+        nonlocal adapter
+        if isinstance(result, Response) or route.response_model is None:
+            return result
+        if adapter is None:
+            adapter = TypeAdapter(route.response_model)
+        value = adapter.validate_python(result, from_attributes=True)
+        return Response(adapter.dump_json(value), media_type="application/json")
+
+    @wraps(call)
+    def wrapper(*args, **kwargs):
+        profiler = current_profiler.get()
+        if profiler is None:
+            return call(*args, **kwargs)
+
+        # Сериализация выполняется здесь же, чтобы попасть в профиль
+        return profiler.run(lambda: serialize(call(*args, **kwargs)))
+
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    """Маршрут, эндпоинт которого можно выполнить под профайлером"""
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if call is not None and not inspect.iscoroutinefunction(call):
+            self.dependant.call = _profiled_endpoint(call, self)
+        return super().get_route_handler()
+
+
+def _profiling_requested(scope) -> tuple[bool, str | None]:
+    requested = False
+    api_key = None
+    header_name = API_KEY_NAME.lower().encode()
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER.encode():
+            requested = value not in (b"", b"0", b"false")
+        elif name == header_name:
+            api_key = value.decode("latin-1")
+
+    if not requested and PROFILE_QUERY_PARAM.encode() in scope["query_string"]:
+        values = parse_qs(scope["query_string"].decode("latin-1")).get(
+            PROFILE_QUERY_PARAM, []
+        )
+        requested = any(v not in ("", "0", "false") for v in values)
+    return requested, api_key
+
+
+class ProfilingMiddleware:
+    """Включает профилирование по заголовку X-Profile или ?profile=1
+
+    Профиль сохраняется в profile_store, его идентификатор возвращается
+    в заголовке X-Profile-Id. Без флага стоимость - просмотр заголовков.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested, api_key = _profiling_requested(scope)
+        # authenticate() после истечения TTL перечитывает ключи из БД -
+        # синхронный запрос не должен блокировать цикл событий
+        key = (
+            await run_in_threadpool(key_store.authenticate, api_key)
+            if requested
+            else None
+        )
+        if key is None or "admin" not in key.scopes:
+            await self.app(scope, receive, send)
+            return
+
+        profiler = StackProfiler()
+        profile_id = uuid.uuid4().hex
+        token = current_profiler.set(profiler)
+        start = perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER.encode(), profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profiler.reset(token)
+            stats = current_request.get()
+            route = scope.get("route")
+            profile_store.add(
+                {
+                    "id": profile_id,
+                    "recorded_at": datetime.now(timezone.utc),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route.path if route is not None else None,
+                    "duration_ms": round((perf_counter() - start) * 1000, 3),
+                    "breakdown_ms": profiler.breakdown(),
+                    "sql_statements": stats.statements if stats is not None else None,
+                    "sql_time_ms": (
+                        round(stats.db_time * 1000, 3) if stats is not None else None
+                    ),
+                    "folded": profiler.folded(),
+                }
+            )
@@ -1,5 +1,13 @@
+from .admin import router as admin_router
 from .buildings import router as buildings_router
 from .businesses import router as businesses_router
+from .changes import router as changes_router
 from .organizations import router as organizations_router
 
-__all__ = ["organizations_router", "buildings_router", "businesses_router"]
+__all__ = [
+    "organizations_router",
+    "buildings_router",
+    "businesses_router",
+    "changes_router",
+    "admin_router",
+]
@@ -0,0 +1,107 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.api_keys import rate_limiter
+from app.dependencies import key_store, require_scope
+from app.profiling import ProfilingRoute, profile_store
+from app.schemas import ApiKeyUsageResponse, ProfileSummaryResponse, SlowQueryResponse
+from app.slow_queries import slow_query_log
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    route_class=ProfilingRoute,
+    dependencies=[Depends(require_scope("admin"))],
+)
+
+
+@router.get(
+    "/slow-queries",
+    response_model=list[SlowQueryResponse],
+    summary="Последние медленные SQL-запросы",
+)
+def get_slow_queries():
+    """
+    Возвращает медленные SQL-запросы от новых к старым
+
+    Returns:
+        Запросы дольше SLOW_QUERY_THRESHOLD_MS с параметрами, маршрутом и
+        планом EXPLAIN QUERY PLAN; full_scans - таблицы, прочитанные целиком
+    """
+    return slow_query_log.entries()
+
+
+@router.delete(
+    "/slow-queries",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Очистить журнал медленных запросов",
+)
+def clear_slow_queries():
+    slow_query_log.clear()
+
+
+@router.get(
+    "/profiles",
+    response_model=list[ProfileSummaryResponse],
+    summary="Последние профили запросов",
+)
+def get_profiles():
+    """
+    Возвращает профили запросов, выполненных с заголовком X-Profile: 1
+    или параметром profile=1, от новых к старым
+
+    Returns:
+        Длительность запроса, собственное время по категориям (sql, orm,
+        serialization, app) и статистика SQL по событиям движка
+    """
+    return profile_store.list()
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=PlainTextResponse,
+    summary="Профиль запроса в формате flame graph",
+)
+def get_profile(profile_id: str):
+    """
+    Возвращает свёрнутые стеки профиля ("кадр;кадр;кадр микросекунды")
+    для flamegraph.pl или speedscope
+
+    Raises:
+        404: Профиль не найден или вытеснен более новыми
+    """
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Профиль {profile_id} не найден",
+        )
+
+    return PlainTextResponse(profile["folded"])
+
+
+@router.get(
+    "/api-keys",
+    response_model=list[ApiKeyUsageResponse],
+    summary="API-ключи и их использование",
+)
+def get_api_key_usage():
+    """
+    Возвращает действующие API-ключи с ограничениями и счётчиками с момента
+    запуска процесса
+
+    Returns:
+        in_flight - запросы в обработке, requests - пропущенные запросы,
+        rate_limited и concurrency_limited - отклонённые с кодом 429
+    """
+    return [
+        {
+            "name": key.name,
+            "scopes": sorted(key.scopes),
+            "rate_per_second": key.rate_per_second,
+            "burst": key.burst,
+            "max_concurrent": key.max_concurrent,
+            **rate_limiter.usage(key.name),
+        }
+        for key in key_store.policies()
+    ]
@@ -1,14 +1,15 @@
-from math import cos, radians
-
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from app.database import get_db
+from app.dependencies import get_geo_area
+from app.facets import get_catalog_counts
 from app.models import Building
-from app.schemas import BuildingResponse
-from app.utils import haversine_distance
+from app.profiling import ProfilingRoute
+from app.schemas import BuildingResponse, BuildingStatsResponse
+from app.utils import bounding_box, haversine_distance
 
-router = APIRouter(prefix="/buildings", tags=["Buildings"])
+router = APIRouter(prefix="/buildings", tags=["Buildings"], route_class=ProfilingRoute)
 
 
 @router.get(
@@ -39,14 +40,7 @@ def get_buildings_nearby(
     Returns:
         Список зданий
     """
-    # Рассчитываем bounding box
-    lat_delta = radius / 111000
-    lon_delta = radius / (111000 * cos(radians(lat)))
-
-    min_lat = lat - lat_delta
-    max_lat = lat + lat_delta
-    min_lon = lon - lon_delta
-    max_lon = lon + lon_delta
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
 
     # Получаем здания в bounding box
     buildings_in_box = (
@@ -69,3 +63,36 @@ def get_buildings_nearby(
         buildings = buildings_in_box
 
     return buildings
+
+
+@router.get(
+    "/stats",
+    response_model=list[BuildingStatsResponse],
+    summary="Количество организаций по зданиям",
+)
+def get_building_stats(
+    name: str | None = Query(
+        None, min_length=2, description="Часть названия организации"
+    ),
+    area: tuple | None = Depends(get_geo_area),
+    db: Session = Depends(get_db),
+):
+    """Возвращает количество организаций в каждом здании
+
+    Args:
+        name: Учитывать только организации с этой частью названия
+        lat, lon, radius, shape: Учитывать только здания в области
+
+    Returns:
+        Здания, в которых есть подходящие организации
+    """
+    state, counts = get_catalog_counts(db, name=name, area=area)
+
+    return [
+        BuildingStatsResponse(
+            id=building_id,
+            address=state["buildings"][building_id][0],
+            organizations=count,
+        )
+        for building_id, count in sorted(counts["buildings"].items())
+    ]
@@ -1,26 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload, selectinload
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
 
+from app.cards import cards_response
+from app.coalesce import coalesce
 from app.database import get_db
-from app.models import Business, Organization, OrganizationBusiness
-from app.schemas import OrganizationResponse
-from app.utils import get_business_subtree_ids
+from app.dependencies import get_geo_area, get_response_format
+from app.facets import get_catalog_counts
+from app.models import Business, OrganizationBusiness
+from app.profiling import ProfilingRoute
+from app.schemas import BusinessStatsResponse, OrganizationListResponse
+from app.utils import business_subtree_select
 
-router = APIRouter(prefix="/businesses", tags=["Businesses"])
+router = APIRouter(
+    prefix="/businesses", tags=["Businesses"], route_class=ProfilingRoute
+)
 
 
 @router.get(
     "/{business_id}/organizations",
-    response_model=list[OrganizationResponse],
+    response_model=OrganizationListResponse,
     summary="Список организаций по виду деятельности рекурсивно",
 )
+@coalesce()
 def get_organizations_by_business_recursive(
-    business_id: int, db: Session = Depends(get_db)
+    business_id: int,
+    response_format: str = Depends(get_response_format),
+    db: Session = Depends(get_db),
 ):
     """Возвращает список организаций по виду деятельности и всем его подвидам
 
     Args:
         business_id: Идентификатор вида деятельности
+        format: normalized - здания и виды деятельности отдельными списками
 
     Returns:
         Список организаций, включая здание, телефоны, виды деятельности
@@ -35,21 +46,62 @@ def get_organizations_by_business_recursive(
             detail=f"Вид деятельности с ID {business_id} не найден",
         )
 
-    business_ids = get_business_subtree_ids(db, business_id)
-
-    orgs = (
-        db.query(Organization)
-        .join(
-            OrganizationBusiness,
-            Organization.id == OrganizationBusiness.organization_id,
-        )
-        .options(
-            joinedload(Organization.building),
-            joinedload(Organization.phones),
-            selectinload(Organization.businesses),
+    org_ids = (
+        db.query(OrganizationBusiness.organization_id)
+        .filter(
+            OrganizationBusiness.business_id.in_(business_subtree_select(business_id))
         )
-        .filter(OrganizationBusiness.business_id.in_(business_ids))
-        .all()
+        .distinct()
+        .order_by(OrganizationBusiness.organization_id)
     )
 
-    return orgs
+    return cards_response(db, [org_id for (org_id,) in org_ids], response_format)
+
+
+@router.get(
+    "/stats",
+    response_model=list[BusinessStatsResponse],
+    summary="Количество организаций по дереву видов деятельности",
+)
+def get_business_stats(
+    name: str | None = Query(
+        None, min_length=2, description="Часть названия организации"
+    ),
+    area: tuple | None = Depends(get_geo_area),
+    db: Session = Depends(get_db),
+):
+    """Возвращает дерево видов деятельности с количеством организаций
+
+    Счётчики берутся из in-memory свёртки каталога, а не из подсчёта
+    по organization_business на каждый запрос
+
+    Args:
+        name: Учитывать только организации с этой частью названия
+        lat, lon, radius, shape: Учитывать только организации в области
+
+    Returns:
+        Корневые виды деятельности с вложенными подвидами: organizations -
+        организации с самим видом, total - с видом или любым подвидом
+    """
+    state, counts = get_catalog_counts(db, name=name, area=area)
+
+    nodes = {
+        id_: BusinessStatsResponse(
+            id=id_,
+            name=business_name,
+            parent_id=parent_id,
+            organizations=counts["direct"].get(id_, 0),
+            total=counts["subtree"].get(id_, 0),
+        )
+        for id_, (business_name, parent_id) in sorted(state["businesses"].items())
+    }
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node.parent_id)
+        if parent is None:
+            roots.append(node)
+        else:
+            parent.children.append(node)
+
+    return roots
@@ -0,0 +1,51 @@
+import json
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.changes import read_changes
+from app.database import get_db
+from app.profiling import ProfilingRoute
+from app.schemas import ChangeFeedResponse
+
+router = APIRouter(prefix="/changes", tags=["Changes"], route_class=ProfilingRoute)
+
+
+@router.get(
+    "",
+    response_model=ChangeFeedResponse,
+    summary="Журнал изменений для инкрементальной синхронизации",
+)
+def get_changes(
+    since: int = Query(0, ge=0, description="Последний полученный номер изменения"),
+    limit: int = Query(500, ge=1, le=5000, description="Размер порции"),
+    db: Session = Depends(get_db),
+):
+    """
+    Возвращает изменения зданий, организаций, телефонов, видов деятельности
+    и их связей в порядке возрастания номера
+
+    Args:
+        since: Номер последнего обработанного изменения, 0 - с начала журнала
+        limit: Максимальное количество изменений в ответе
+
+    Returns:
+        Изменения: op=upsert содержит строку целиком, op=delete - только ключ.
+        last_seq передаётся в since следующего запроса, пока has_more=true
+    """
+    rows, has_more = read_changes(db, since, limit)
+
+    return {
+        "changes": [
+            {
+                "seq": row.seq,
+                "entity": row.entity,
+                "id": row.entity_id,
+                "op": row.operation,
+                "data": json.loads(row.payload),
+            }
+            for row in rows
+        ],
+        "last_seq": rows[-1].seq if rows else since,
+        "has_more": has_more,
+    }
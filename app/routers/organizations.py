@@ -1,23 +1,47 @@
-from math import cos, radians
-
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm import Session
 
+from app.cards import card_response, cards_page_response, cards_response, get_cards
+from app.coalesce import coalesce
 from app.database import get_db
-from app.models import Building, Business, Organization, OrganizationBusiness
-from app.schemas import OrganizationResponse
-from app.utils import haversine_distance
+from app.dependencies import get_geo_area, get_response_format
+from app.fuzzy import fuzzy_search_ids, substring_search_ids
+from app.models import Building, Business, Organization, OrganizationBusiness, Phone
+from app.profiling import ProfilingRoute
+from app.schemas import (
+    OrganizationListResponse,
+    OrganizationPageResponse,
+    OrganizationResponse,
+    OrganizationSuggestion,
+    QueryPlanResponse,
+)
+from app.search import build_organization_filter_query
+from app.suggest import suggest_organizations
+from app.utils import (
+    bounding_box,
+    explain_query_plan,
+    haversine_distance,
+    normalize_phone,
+)
 
-router = APIRouter(prefix="/organizations", tags=["Organizations"])
+router = APIRouter(
+    prefix="/organizations", tags=["Organizations"], route_class=ProfilingRoute
+)
 
 
 @router.get(
     "/search",
-    response_model=list[OrganizationResponse],
+    response_model=OrganizationListResponse,
     summary="Организация по названию",
 )
 def search_organization_by_name(
     name: str = Query(..., min_length=2, description="Название организации для поиска"),
+    mode: str = Query(
+        "substring",
+        pattern="^(substring|fuzzy)$",
+        description="substring - частичное совпадение, fuzzy - с опечатками",
+    ),
+    response_format: str = Depends(get_response_format),
     db: Session = Depends(get_db),
 ):
     """
@@ -25,31 +49,25 @@ def search_organization_by_name(
 
     Args:
         name: Часть названия организации, минимум 2 символа
+        mode: В режиме fuzzy допускаются опечатки (одна на 4 символа, не
+            больше двух), результаты отсортированы по близости
+        format: normalized - здания и виды деятельности отдельными списками
 
     Returns:
         Список организаций, включая здание, телефоны, виды деятельности
     """
-    orgs = (
-        db.query(Organization)
-        .options(
-            joinedload(Organization.building),
-            joinedload(Organization.phones),
-            selectinload(Organization.businesses),
-        )
-        .all()
-    )
+    if mode == "fuzzy":
+        return cards_response(db, fuzzy_search_ids(db, name), response_format)
 
-    # Регистронезависимый поиск
-    search_term = name.lower()
-    filtered_orgs = [org for org in orgs if search_term in org.name.lower()]
-    return filtered_orgs
+    return cards_response(db, substring_search_ids(db, name), response_format)
 
 
 @router.get(
     "/nearby",
-    response_model=list[OrganizationResponse],
+    response_model=OrganizationListResponse,
     summary="Организации в радиусе",
 )
+@coalesce()
 def get_organizations_nearby(
     lat: float = Query(..., ge=-90, le=90, description="Широта центра"),
     lon: float = Query(..., ge=-180, le=180, description="Долгота центра"),
@@ -59,6 +77,7 @@ def get_organizations_nearby(
     shape: str = Query(
         "circle", regex="^(circle|square)$", description="Форма области"
     ),
+    response_format: str = Depends(get_response_format),
     db: Session = Depends(get_db),
 ):
     """
@@ -69,20 +88,13 @@ def get_organizations_nearby(
         lon: Долгота центральной точки
         circle: Организации в круге заданного радиуса
         square: Организации в квадрате со стороной = 2 * радиус
+        format: normalized - здания и виды деятельности отдельными списками
 
     Returns:
         Список организаций, включая здание, телефоны, виды деятельности
     """
 
-    # Рассчитываем bounding box
-    lat_delta = radius / 111000
-    cos_lat = max(cos(radians(lat)), 1e-10)
-    lon_delta = radius / (111000 * cos(radians(cos_lat)))
-
-    min_lat = lat - lat_delta
-    max_lat = lat + lat_delta
-    min_lon = lon - lon_delta
-    max_lon = lon + lon_delta
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
 
     # Получаем здания в bounding box
     buildings_in_box = (
@@ -105,32 +117,32 @@ def get_organizations_nearby(
         building_ids = [b.id for b in buildings_in_box]
 
     if not building_ids:
-        return []
-
-    orgs = (
-        db.query(Organization)
-        .options(
-            joinedload(Organization.building),
-            joinedload(Organization.phones),
-            selectinload(Organization.businesses),
-        )
+        return cards_response(db, [], response_format)
+
+    org_ids = (
+        db.query(Organization.id)
         .filter(Organization.building_id.in_(building_ids))
-        .all()
+        .order_by(Organization.id)
     )
 
-    return orgs
+    return cards_response(db, [org_id for (org_id,) in org_ids], response_format)
 
 
 @router.get(
     "/building/{building_id}",
-    response_model=list[OrganizationResponse],
+    response_model=OrganizationListResponse,
     summary="Список организаций в здании",
 )
-def get_organizations_by_building(building_id: int, db: Session = Depends(get_db)):
+def get_organizations_by_building(
+    building_id: int,
+    response_format: str = Depends(get_response_format),
+    db: Session = Depends(get_db),
+):
     """Возвращает список всех организаций, находящихся в конкретном здании
 
     Args:
         building_id: Идентификатор здания
+        format: normalized - здания и виды деятельности отдельными списками
 
     Returns:
         Список организаций, включая здание, телефоны, виды деятельности
@@ -145,30 +157,30 @@ def get_organizations_by_building(building_id: int, db: Session = Depends(get_db
             detail=f"Здание с ID {building_id} не найден",
         )
 
-    orgs = (
-        db.query(Organization)
-        .options(
-            joinedload(Organization.building),
-            joinedload(Organization.phones),
-            selectinload(Organization.businesses),
-        )
+    org_ids = (
+        db.query(Organization.id)
         .filter(Organization.building_id == building_id)
-        .all()
+        .order_by(Organization.id)
     )
 
-    return orgs
+    return cards_response(db, [org_id for (org_id,) in org_ids], response_format)
 
 
 @router.get(
     "/business/{business_id}",
-    response_model=list[OrganizationResponse],
+    response_model=OrganizationListResponse,
     summary="Список организаций по виду деятельности",
 )
-def get_organizations_by_business(business_id: int, db: Session = Depends(get_db)):
+def get_organizations_by_business(
+    business_id: int,
+    response_format: str = Depends(get_response_format),
+    db: Session = Depends(get_db),
+):
     """Возвращает список всех организаций, которые относятся к указанному виду деятельности
 
     Args:
         business_id: Идентификатор вида деятельности
+        format: normalized - здания и виды деятельности отдельными списками
 
     Returns:
         Список организаций, включая здание, телефоны, виды деятельности
@@ -183,22 +195,186 @@ def get_organizations_by_business(business_id: int, db: Session = Depends(get_db
             detail=f"Вид деятельности с ID {business_id} не найден",
         )
 
-    orgs = (
-        db.query(Organization)
-        .join(
-            OrganizationBusiness,
-            Organization.id == OrganizationBusiness.organization_id,
+    org_ids = (
+        db.query(OrganizationBusiness.organization_id)
+        .filter(OrganizationBusiness.business_id == business_id)
+        .order_by(OrganizationBusiness.organization_id)
+    )
+
+    return cards_response(db, [org_id for (org_id,) in org_ids], response_format)
+
+
+@router.get(
+    "/suggest",
+    response_model=list[OrganizationSuggestion],
+    summary="Автодополнение названия организации",
+)
+def suggest_organization_names(
+    q: str = Query(..., min_length=1, description="Начало слова в названии"),
+    limit: int = Query(10, ge=1, le=50, description="Максимум подсказок"),
+    db: Session = Depends(get_db),
+):
+    """
+    Подсказки по началу любого слова в названии (без учёта регистра,
+    кавычек и различия ё/е). Отвечает из in-memory индекса; к БД обращается
+    не чаще раза в полсекунды, чтобы сверить индекс с data_version
+
+    Args:
+        q: Начало слова в названии
+        limit: Максимальное количество подсказок
+
+    Returns:
+        Список пар идентификатор - название
+    """
+    return [
+        {"id": org_id, "name": name}
+        for org_id, name in suggest_organizations(db, q, limit)
+    ]
+
+
+@router.get(
+    "/by-phone",
+    response_model=OrganizationListResponse,
+    summary="Организации по номеру телефона",
+)
+def get_organizations_by_phone(
+    number: str = Query(
+        ..., min_length=1, max_length=25, description="Номер телефона в любом формате"
+    ),
+    prefix: bool = Query(False, description="Искать номера, начинающиеся с number"),
+    limit: int = Query(50, ge=1, le=100, description="Максимум организаций"),
+    response_format: str = Depends(get_response_format),
+    db: Session = Depends(get_db),
+):
+    """Обратный поиск организаций по телефону
+
+    Номер приводится к цифрам в формате E.164 ("8 (495) 123-45-67" и
+    "+7 495 1234567" совпадают) и ищется по индексу normalized_number
+
+    Args:
+        number: Номер телефона или его начало, начиная с кода страны
+        prefix: Искать по началу номера
+        limit: Максимальное количество организаций
+        format: normalized - здания и виды деятельности отдельными списками
+
+    Returns:
+        Список организаций, включая здание, телефоны, виды деятельности
+
+    Raises:
+        422: В номере нет цифр
+    """
+    digits = normalize_phone(number)
+    if not digits:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Номер телефона должен содержать цифры",
         )
-        .options(
-            joinedload(Organization.building),
-            joinedload(Organization.phones),
-            selectinload(Organization.businesses),
+
+    if prefix:
+        # Диапазон вместо LIKE, чтобы использовался индекс: ":" идёт после "9"
+        condition = Phone.normalized_number >= digits
+        condition &= Phone.normalized_number < digits + ":"
+    else:
+        condition = Phone.normalized_number == digits
+
+    org_ids = (
+        db.query(Phone.organization_id)
+        .filter(condition)
+        .distinct()
+        .order_by(Phone.organization_id)
+        .limit(limit)
+    )
+
+    return cards_response(db, [org_id for (org_id,) in org_ids], response_format)
+
+
+@router.get(
+    "/filter",
+    response_model=OrganizationPageResponse,
+    summary="Организации по комбинации фильтров",
+)
+def filter_organizations(
+    name: str | None = Query(
+        None, min_length=2, description="Часть названия организации"
+    ),
+    business_id: int | None = Query(None, description="Вид деятельности"),
+    include_subtree: bool = Query(True, description="Учитывать подвиды деятельности"),
+    building_id: int | None = Query(None, description="Идентификатор здания"),
+    area: tuple | None = Depends(get_geo_area),
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    offset: int = Query(0, ge=0, description="Смещение от начала выборки"),
+    explain: bool = Query(False, description="Вернуть выбранный план запроса"),
+    db: Session = Depends(get_db),
+):
+    """
+    Поиск организаций по любой комбинации фильтров одним запросом к БД,
+    страница собирается из сохранённых карточек
+
+    Args:
+        name: Часть названия организации (регистронезависимо)
+        business_id: Вид деятельности, с подвидами если include_subtree
+        building_id: Идентификатор здания
+        lat, lon, radius, shape: Область на карте, задаётся целиком
+        limit, offset: Пагинация
+        explain: Добавить в ответ порядок фильтров и EXPLAIN QUERY PLAN
+
+    Returns:
+        Страница организаций, включая здание, телефоны, виды деятельности
+
+    Raises:
+        422: Область задана не полностью
+    """
+    query, order = build_organization_filter_query(
+        db,
+        name=name,
+        business_id=business_id,
+        include_subtree=include_subtree,
+        building_id=building_id,
+        area=area,
+    )
+    page = query.limit(limit).offset(offset)
+
+    plan = None
+    if explain:
+        plan = QueryPlanResponse(
+            driver=order[0] if order else None,
+            filters=order,
+            sqlite_plan=explain_query_plan(db, page),
         )
-        .filter(OrganizationBusiness.business_id == business_id)
-        .all()
+
+    return cards_page_response(
+        db,
+        [org_id for (org_id,) in page],
+        limit=limit,
+        offset=offset,
+        plan=plan.model_dump() if plan else None,
     )
 
-    return orgs
+
+@router.get(
+    "/batch",
+    response_model=OrganizationListResponse,
+    summary="Несколько организаций по идентификаторам",
+)
+def get_organizations_batch(
+    ids: list[int] = Query(
+        ..., min_length=1, max_length=100, description="Идентификаторы организаций"
+    ),
+    response_format: str = Depends(get_response_format),
+    db: Session = Depends(get_db),
+):
+    """
+    Возвращает организации в порядке переданных идентификаторов,
+    несуществующие идентификаторы пропускаются
+
+    Args:
+        ids: Идентификаторы организаций, до 100 штук
+        format: normalized - здания и виды деятельности отдельными списками
+
+    Returns:
+        Список организаций, включая здание, телефоны, виды деятельности
+    """
+    return cards_response(db, list(dict.fromkeys(ids)), response_format)
 
 
 @router.get(
@@ -219,21 +395,12 @@ def get_organization_by_id(organization_id: int, db: Session = Depends(get_db)):
     Raises:
         404: Организация не найдена
     """
-    org = (
-        db.query(Organization)
-        .options(
-            joinedload(Organization.building),
-            joinedload(Organization.phones),
-            selectinload(Organization.businesses),
-        )
-        .filter(Organization.id == organization_id)
-        .first()
-    )
+    cards = get_cards(db, [organization_id])
 
-    if not org:
+    if not cards:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Организация с ID {organization_id} не найдена",
         )
 
-    return org
+    return card_response(cards[0])
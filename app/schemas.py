@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, ConfigDict
 
 
@@ -33,3 +35,104 @@ class OrganizationResponse(BaseModel):
     phones: list[PhoneResponse]
     businesses: list[BusinessResponse]
     building: BuildingResponse
+
+
+class NormalizedOrganizationResponse(BaseModel):
+    id: int
+    name: str
+    phones: list[PhoneResponse]
+    building_id: int
+    business_ids: list[int]
+
+
+class NormalizedOrganizationListResponse(BaseModel):
+    organizations: list[NormalizedOrganizationResponse]
+    buildings: list[BuildingResponse]
+    businesses: list[BusinessResponse]
+
+
+OrganizationListResponse = (
+    list[OrganizationResponse] | NormalizedOrganizationListResponse
+)
+
+
+class QueryPlanResponse(BaseModel):
+    driver: str | None
+    filters: list[str]
+    sqlite_plan: list[str]
+
+
+class OrganizationPageResponse(BaseModel):
+    items: list[OrganizationResponse]
+    limit: int
+    offset: int
+    plan: QueryPlanResponse | None = None
+
+
+class BusinessStatsResponse(BaseModel):
+    id: int
+    name: str
+    parent_id: int | None = None
+    organizations: int
+    total: int
+    children: list["BusinessStatsResponse"] = []
+
+
+class BuildingStatsResponse(BaseModel):
+    id: int
+    address: str
+    organizations: int
+
+
+class OrganizationSuggestion(BaseModel):
+    id: int
+    name: str
+
+
+class ChangeRecord(BaseModel):
+    seq: int
+    entity: str
+    id: str
+    op: str
+    data: dict
+
+
+class ChangeFeedResponse(BaseModel):
+    changes: list[ChangeRecord]
+    last_seq: int
+    has_more: bool
+
+
+class SlowQueryResponse(BaseModel):
+    recorded_at: datetime
+    duration_ms: float
+    statement: str
+    parameters: list
+    method: str | None
+    route: str | None
+    plan: list[str]
+    full_scans: list[str]
+
+
+class ProfileSummaryResponse(BaseModel):
+    id: str
+    recorded_at: datetime
+    method: str
+    path: str
+    route: str | None
+    duration_ms: float
+    breakdown_ms: dict[str, float]
+    sql_statements: int | None
+    sql_time_ms: float | None
+
+
+class ApiKeyUsageResponse(BaseModel):
+    name: str
+    scopes: list[str]
+    rate_per_second: float | None
+    burst: int | None
+    max_concurrent: int | None
+    in_flight: int
+    requests: int
+    rate_limited: int
+    concurrency_limited: int
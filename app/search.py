@@ -0,0 +1,98 @@
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.orm import Query, Session
+
+from app.fuzzy import substring_filter
+from app.models import Building, Organization, OrganizationBusiness
+from app.utils import bounding_box, business_subtree_select
+
+# Чем меньше значение, тем селективнее фильтр: в здании - единицы организаций,
+# у вида деятельности - десятки, в области на карте - сотни, а поиск
+# по подстроке названия отбирается по триграммам и для коротких запросов
+# совпадает с заметной частью каталога
+FILTER_SELECTIVITY = {
+    "building": 0,
+    "business": 1,
+    "business_subtree": 2,
+    "area": 3,
+    "name": 4,
+}
+
+
+def build_organization_filter_query(
+    db: Session,
+    *,
+    name: str | None = None,
+    business_id: int | None = None,
+    include_subtree: bool = True,
+    building_id: int | None = None,
+    area: tuple[float, float, float, str] | None = None,
+) -> tuple[Query, list[str]]:
+    """Собирает один запрос по любой комбинации фильтров
+
+    Самый селективный фильтр становится ведущим и записывается в форме,
+    которая использует индекс (равенство или IN по подзапросу или списку). Остальные
+    проверяются коррелированными EXISTS для уже найденных строк.
+
+    Args:
+        name: Часть названия организации
+        business_id: Идентификатор вида деятельности
+        include_subtree: Учитывать подвиды деятельности
+        building_id: Идентификатор здания
+        area: Область (lat, lon, radius, shape)
+
+    Returns:
+        Запрос ID организаций по возрастанию и список фильтров в порядке
+        применения
+    """
+    # Для каждого фильтра: (ведущая форма, остаточная форма)
+    filters = {}
+
+    if building_id is not None:
+        clause = Organization.building_id == building_id
+        filters["building"] = (clause, clause)
+
+    if business_id is not None:
+        business_ids = (
+            business_subtree_select(business_id) if include_subtree else [business_id]
+        )
+        linked = select(OrganizationBusiness.organization_id).where(
+            OrganizationBusiness.business_id.in_(business_ids)
+        )
+        residual = exists().where(
+            OrganizationBusiness.organization_id == Organization.id,
+            OrganizationBusiness.business_id.in_(business_ids),
+        )
+        key = "business_subtree" if include_subtree else "business"
+        filters[key] = (Organization.id.in_(linked), residual)
+
+    if area is not None:
+        lat, lon, radius, shape = area
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
+        conditions = [
+            Building.latitude.between(min_lat, max_lat),
+            Building.longitude.between(min_lon, max_lon),
+        ]
+        if shape == "circle":
+            conditions.append(
+                func.haversine(lat, lon, Building.latitude, Building.longitude)
+                <= radius
+            )
+        in_area = select(Building.id).where(*conditions)
+        residual = exists().where(Building.id == Organization.building_id, *conditions)
+        filters["area"] = (Organization.building_id.in_(in_area), residual)
+
+    if name:
+        clause = func.py_lower(Organization.name).contains(
+            name.lower(), autoescape=True
+        )
+        # Ведущая форма (кандидаты из индекса названий по первичному ключу)
+        # нужна, только если других фильтров нет: название - самый слабый
+        leading = clause if filters else and_(substring_filter(db, name), clause)
+        filters["name"] = (leading, clause)
+
+    order = sorted(filters, key=FILTER_SELECTIVITY.get)
+    conditions = [filters[key][0] for key in order[:1]]
+    conditions += [filters[key][1] for key in order[1:]]
+
+    query = db.query(Organization.id).filter(*conditions).order_by(Organization.id)
+    return query, order
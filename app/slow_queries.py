@@ -0,0 +1,107 @@
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+from threading import Lock
+
+from app.metrics import current_request
+from app.utils import full_scans
+
+logger = logging.getLogger(__name__)
+
+MAX_PARAMETER_LENGTH = 200
+
+
+class SlowQueryLog:
+    """Кольцевой буфер последних медленных SQL-запросов"""
+
+    def __init__(self, size: int = 200):
+        self._lock = Lock()
+        self._entries = deque(maxlen=size)
+
+    def resize(self, size: int) -> None:
+        with self._lock:
+            self._entries = deque(self._entries, maxlen=size)
+
+    def add(self, entry: dict) -> None:
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self) -> list[dict]:
+        """Записи от новых к старым"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def _format_parameter(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, (int, float, type(None))):
+        return value
+    text = str(value)
+    if len(text) > MAX_PARAMETER_LENGTH:
+        return text[:MAX_PARAMETER_LENGTH] + "…"
+    return text
+
+
+def _format_parameters(parameters) -> list:
+    if isinstance(parameters, dict):
+        parameters = parameters.values()
+    return [_format_parameter(value) for value in parameters or ()]
+
+
+def _explain(cursor, statement: str, parameters) -> list[str]:
+    """EXPLAIN QUERY PLAN на том же соединении, в обход событий движка"""
+    if statement.split(None, 1)[0].upper() not in ("SELECT", "WITH"):
+        return []
+    try:
+        rows = cursor.connection.execute(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        ).fetchall()
+    except Exception as exc:  # план - вспомогательная информация
+        return [f"EXPLAIN QUERY PLAN не выполнен: {exc}"]
+    return [row[-1] for row in rows]
+
+
+def slow_query_observer():
+    """Наблюдатель общего таймера SQL (install_sql_instrumentation)
+
+    Записывает запросы дольше SLOW_QUERY_THRESHOLD_MS вместе с планом
+    """
+    threshold = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100")) / 1000
+    slow_query_log.resize(int(os.getenv("SLOW_QUERY_LOG_SIZE", "200")))
+
+    def _check_duration(cursor, statement, parameters, executemany, elapsed):
+        if elapsed < threshold:
+            return
+
+        stats = current_request.get()
+        plan = [] if executemany else _explain(cursor, statement, parameters)
+        entry = {
+            "recorded_at": datetime.now(timezone.utc),
+            "duration_ms": round(elapsed * 1000, 3),
+            "statement": statement,
+            "parameters": [] if executemany else _format_parameters(parameters),
+            "method": stats.scope["method"] if stats is not None else None,
+            "route": stats.route if stats is not None else None,
+            "plan": plan,
+            "full_scans": full_scans(plan),
+        }
+        slow_query_log.add(entry)
+        logger.warning(
+            "Медленный запрос %.1f мс (%s %s): %s | план: %s",
+            entry["duration_ms"],
+            entry["method"],
+            entry["route"],
+            statement,
+            "; ".join(plan),
+        )
+
+    return _check_duration
@@ -0,0 +1,64 @@
+from bisect import bisect_left
+
+from sqlalchemy.orm import Session
+
+from app.cache import InMemoryIndex
+from app.models import Organization
+from app.utils import normalize_name
+
+
+class NameSuggestIndex(InMemoryIndex):
+    """Отсортированный массив нормализованных названий для автодополнения
+
+    Для каждого слова названия хранится ключ - остаток названия начиная
+    с этого слова, поэтому "коп" находит "ООО 'Рога и Копыта'".
+    Поиск префикса - бинарный поиск по массиву ключей. С data_version
+    индекс сверяется не чаще раза в recheck_interval, поэтому подсказки
+    при наборе отвечают из памяти, а новое название появляется в них
+    с задержкой до полсекунды.
+    """
+
+    tables = frozenset({"organization"})
+    recheck_interval = 0.5
+
+    def load(self, db: Session) -> tuple[list[str], list[tuple[int, str]]]:
+        entries = []
+        for org_id, name in db.query(Organization.id, Organization.name):
+            normalized = normalize_name(name)
+            for start in _word_starts(normalized):
+                entries.append((normalized[start:], org_id, name))
+        entries.sort()
+
+        keys = [key for key, _, _ in entries]
+        values = [(org_id, name) for _, org_id, name in entries]
+        return keys, values
+
+
+def _word_starts(text: str) -> list[int]:
+    return [
+        i
+        for i, char in enumerate(text)
+        if char.isalnum() and (i == 0 or not text[i - 1].isalnum())
+    ]
+
+
+name_suggest_index = NameSuggestIndex()
+
+
+def suggest_organizations(db: Session, q: str, limit: int) -> list[tuple[int, str]]:
+    """Возвращает до limit пар (id, название), в которых слово начинается с q"""
+    prefix = normalize_name(q)
+    if not prefix:
+        return []
+
+    keys, values = name_suggest_index.get(db)
+    found = {}
+    position = bisect_left(keys, prefix)
+    while position < len(keys) and keys[position].startswith(prefix):
+        org_id, name = values[position]
+        found.setdefault(org_id, name)
+        if len(found) >= limit:
+            break
+        position += 1
+
+    return list(found.items())
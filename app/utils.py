@@ -1,26 +1,54 @@
+import re
 from math import atan2, cos, radians, sin, sqrt
 
-from sqlalchemy.orm import Session
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Query, Session
 
 from app.models import Business
 
+BUSINESS_TREE_DEPTH = 3
 
-def get_business_subtree_ids(db: Session, root_id: int) -> set[int]:
-    """Возвращает ID корня и потомков"""
-    all_ids = {root_id}
 
-    children = db.query(Business.id).filter(Business.parent_id == root_id).all()
-    child_ids = {c[0] for c in children}
-    all_ids.update(child_ids)
+def business_subtree_select(root_id: int):
+    """Подзапрос с ID корня и потомков (рекурсивный CTE, без обращения к БД)
 
-    if child_ids:
-        grandchildren = (
-            db.query(Business.id).filter(Business.parent_id.in_(child_ids)).all()
+    Спуск ограничен BUSINESS_TREE_DEPTH уровнями вместе с корнем, поэтому
+    цикл в parent_id не зацикливает запрос
+    """
+    tree = (
+        select(Business.id, literal(1).label("depth"))
+        .where(Business.id == root_id)
+        .cte("business_tree", recursive=True)
+    )
+    tree = tree.union_all(
+        select(Business.id, tree.c.depth + 1).where(
+            Business.parent_id == tree.c.id, tree.c.depth < BUSINESS_TREE_DEPTH
         )
-        grandchild_ids = {g[0] for g in grandchildren}
-        all_ids.update(grandchild_ids)
+    )
+    return select(tree.c.id)
 
-    return all_ids
+
+_QUOTES_RE = re.compile(r"[\"'`«»“”„‘’]")
+_SPACES_RE = re.compile(r"\s+")
+_NON_DIGITS_RE = re.compile(r"\D")
+
+
+def normalize_name(name: str) -> str:
+    """Приводит название к виду для поиска: регистр, ё→е, без кавычек"""
+    name = _QUOTES_RE.sub("", name.casefold().replace("ё", "е"))
+    return _SPACES_RE.sub(" ", name).strip()
+
+
+def normalize_phone(number: str) -> str:
+    """Оставляет цифры номера в формате E.164 без "+"
+
+    Номер без "+" с ведущей 8 считается российским: 8-800-... -> 7800...
+    Подходит и для начала номера при поиске по префиксу.
+    """
+    digits = _NON_DIGITS_RE.sub("", number)
+    if not number.lstrip().startswith("+") and digits.startswith("8"):
+        digits = "7" + digits[1:]
+    return digits
 
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -32,3 +60,45 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
     return R * c
+
+
+def bounding_box(
+    lat: float, lon: float, radius: float
+) -> tuple[float, float, float, float]:
+    """Возвращает (min_lat, max_lat, min_lon, max_lon) квадрата вокруг точки"""
+    lat_delta = radius / 111000
+    cos_lat = max(cos(radians(lat)), 1e-10)
+    lon_delta = radius / (111000 * cos_lat)
+    return lat - lat_delta, lat + lat_delta, lon - lon_delta, lon + lon_delta
+
+
+def explain_query_plan(db: Session, query: Query) -> list[str]:
+    """Возвращает вывод EXPLAIN QUERY PLAN для ORM-запроса"""
+    sql = str(
+        query.statement.compile(
+            dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan: list[str]) -> list[str]:
+    """Таблицы, которые план EXPLAIN QUERY PLAN читает целиком
+
+    Сканирование CTE и подзапросов (CO-ROUTINE, MATERIALIZE) не учитывается,
+    как и FTS5 с условием MATCH: он читает только свой индекс (idxStr "0:M0")
+    """
+    virtual = {
+        line.split()[1]
+        for line in plan
+        if line.startswith(("CO-ROUTINE ", "MATERIALIZE "))
+    }
+    return [
+        line.split()[1]
+        for line in plan
+        if line.startswith("SCAN ")
+        and line.split()[1] not in virtual
+        and not line.startswith("SCAN CONSTANT ROW")
+        and not (" VIRTUAL TABLE INDEX " in line and ":M" in line.split()[-1])
+    ]
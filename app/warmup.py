@@ -0,0 +1,177 @@
+import logging
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session, configure_mappers
+
+from app.cache import registered_indexes
+from app.cards import write_cards
+from app.database import SessionLocal
+from app.dependencies import key_store
+from app.models import (
+    Building,
+    Organization,
+    OrganizationBusiness,
+    OrganizationCard,
+    Phone,
+)
+from app.routers import businesses, organizations
+
+logger = logging.getLogger(__name__)
+
+PREFILL_CHUNK = 500
+
+
+class Readiness:
+    """Состояние прогрева: текущий шаг и длительность завершённых шагов"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.ready = False
+        self.step: str | None = None
+        self.timings: dict[str, float] = {}
+        self.error: str | None = None
+
+    def begin(self, step: str) -> None:
+        with self._lock:
+            self.step = step
+
+    def done(self, step: str, elapsed: float) -> None:
+        with self._lock:
+            self.timings[step] = round(elapsed * 1000, 3)
+
+    def finish(self, error: str | None = None) -> None:
+        with self._lock:
+            self.ready = True
+            self.step = None
+            self.error = error
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "step": self.step,
+                "timings_ms": dict(self.timings),
+                "error": self.error,
+            }
+
+
+readiness = Readiness()
+
+
+def prefill_cards(db: Session) -> int:
+    """Строит недостающие карточки организаций, чтобы чтение их не ждало"""
+    missing = [
+        org_id
+        for (org_id,) in db.query(Organization.id).filter(
+            ~exists().where(
+                OrganizationCard.organization_id == Organization.id,
+                OrganizationCard.compact.is_not(None),
+            )
+        )
+    ]
+    for start in range(0, len(missing), PREFILL_CHUNK):
+        write_cards(db, missing[start : start + PREFILL_CHUNK])
+        db.commit()
+    return len(missing)
+
+
+def prime_page_cache(db: Session) -> None:
+    """Читает карточки и индексы горячих маршрутов, чтобы их страницы
+    оказались в кеше ОС и SQLite до первых запросов"""
+    db.execute(
+        select(
+            func.sum(func.length(OrganizationCard.payload)),
+            func.sum(func.length(OrganizationCard.compact)),
+        )
+    )
+    # Условия по индексированным колонкам читают только страницы индексов,
+    # по которым идут поиск по координатам, телефону, зданию и виду деятельности
+    db.execute(select(func.count()).where(Building.latitude >= -90))
+    db.execute(select(func.count()).where(Phone.normalized_number >= ""))
+    db.execute(select(func.count()).where(Organization.building_id >= 0))
+    db.execute(select(func.count()).where(OrganizationBusiness.business_id >= 0))
+
+
+def warm_routes(db: Session) -> None:
+    """Вызывает горячие эндпоинты для организации из каталога
+
+    Первые выполнения компилируют запросы маршрутов и наполняют кеш
+    скомпилированных запросов SQLAlchemy
+    """
+    sample = db.execute(
+        select(
+            Organization.id,
+            Organization.name,
+            Building.id,
+            Building.latitude,
+            Building.longitude,
+            OrganizationBusiness.business_id,
+        )
+        .join(Building, Building.id == Organization.building_id)
+        .join(
+            OrganizationBusiness,
+            OrganizationBusiness.organization_id == Organization.id,
+        )
+        .limit(1)
+    ).first()
+    if sample is None:
+        return
+
+    org_id, name, building_id, lat, lon, business_id = sample
+    phone = db.scalar(
+        select(Phone.normalized_number).where(Phone.organization_id == org_id)
+    )
+    # Аргументы передаются по именам, как их передаёт FastAPI: по ним
+    # строится ключ объединения запросов
+    for response_format in ("full", "normalized"):
+        common = {"response_format": response_format, "db": db}
+        organizations.get_organizations_by_building(building_id=building_id, **common)
+        organizations.get_organizations_by_business(business_id=business_id, **common)
+        organizations.get_organizations_nearby(
+            lat=float(lat), lon=float(lon), radius=1000.0, shape="circle", **common
+        )
+        organizations.search_organization_by_name(
+            name=name[:3], mode="substring", **common
+        )
+        businesses.get_organizations_by_business_recursive(
+            business_id=business_id, **common
+        )
+        if phone:
+            organizations.get_organizations_by_phone(
+                number=phone, prefix=False, limit=50, **common
+            )
+    organizations.get_organization_by_id(organization_id=org_id, db=db)
+
+
+def warm_up() -> None:
+    """Прогрев после запуска; /ready отвечает 200 только после него
+
+    Ошибка прогрева не мешает работе: всё, что он строит заранее,
+    строится и при первом обращении
+    """
+    steps = [
+        ("configure_mappers", lambda db: configure_mappers()),
+        ("prefill_cards", prefill_cards),
+        ("page_cache", prime_page_cache),
+        ("indexes", lambda db: [index.get(db) for index in registered_indexes()]),
+        ("api_keys", lambda db: key_store.policies()),
+        ("routes", warm_routes),
+    ]
+    start = perf_counter()
+    error = None
+    db = SessionLocal()
+    try:
+        for name, step in steps:
+            readiness.begin(name)
+            step_start = perf_counter()
+            step(db)
+            readiness.done(name, perf_counter() - step_start)
+    except Exception as exc:
+        logger.exception("Прогрев прерван на шаге %s", name)
+        error = f"{name}: {exc}"
+    finally:
+        db.close()
+        readiness.finish(error)
+        logger.info("Прогрев завершён за %.0f мс", (perf_counter() - start) * 1000)
@@ -0,0 +1,114 @@
+"""Число SQL-запросов при одновременных одинаковых запросах к эндпоинту
+
+Запуск: python benchmarks/coalescing.py (нужна наполненная database.db)
+
+Несколько потоков одновременно вызывают эндпоинт с одними и теми же
+параметрами - так выглядит всплеск трафика на одну точку карты. Эндпоинт
+вызывается без объединения (исходная функция) и с ним. Каждый SQL-запрос
+искусственно задерживается, чтобы вызовы пересекались во времени, как на
+нагруженной БД.
+
+Скрипт падает, если с объединением запросов к БД не примерно в CLIENTS раз
+меньше: все клиенты всплеска должны уложиться в MAX_FLIGHTS выполнений.
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Barrier
+from time import perf_counter, sleep
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from sqlalchemy import event
+
+from app.database import SessionLocal, engine
+from app.routers.businesses import get_organizations_by_business_recursive
+from app.routers.organizations import get_organizations_nearby
+
+CLIENTS = 32
+STATEMENT_LATENCY = 0.01
+# Сколько раз эндпоинт может выполниться за всплеск с объединением: клиент,
+# опоздавший к завершению первого выполнения, запускает второе
+MAX_FLIGHTS = 2
+
+CASES = [
+    (
+        "/organizations/nearby",
+        get_organizations_nearby,
+        {
+            "lat": 55.7558,
+            "lon": 37.6176,
+            "radius": 3000.0,
+            "shape": "circle",
+            "response_format": "full",
+        },
+    ),
+    (
+        "/businesses/1/organizations",
+        get_organizations_by_business_recursive,
+        {"business_id": 1, "response_format": "full"},
+    ),
+]
+
+statements = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+    sleep(STATEMENT_LATENCY)
+
+
+def burst(endpoint, params: dict) -> tuple[int, float]:
+    """Returns: число SQL-запросов и время всплеска в мс"""
+    global statements
+    barrier = Barrier(CLIENTS)
+
+    def client():
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            return endpoint(**params, db=db)
+        finally:
+            db.close()
+
+    statements = 0
+    start = perf_counter()
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        responses = list(pool.map(lambda _: client(), range(CLIENTS)))
+    elapsed = (perf_counter() - start) * 1000
+
+    bodies = {response.body for response in responses}
+    assert len(bodies) == 1, "клиенты получили разные ответы"
+    return statements, elapsed
+
+
+def main():
+    print(
+        f"{CLIENTS} одновременных клиентов, задержка SQL {STATEMENT_LATENCY * 1000} мс"
+    )
+    print(f"{'эндпоинт':<30} {'без объединения':>22} {'с объединением':>22}")
+    for path, endpoint, params in CASES:
+        # Прогрев: карточки организаций
+        with SessionLocal() as db:
+            endpoint(**params, db=db)
+        plain = burst(endpoint.__wrapped__, params)
+        coalesced = burst(endpoint, params)
+        print(
+            f"{path:<30} "
+            f"{plain[0]:>5} SQL {plain[1]:>8.1f} мс    "
+            f"{coalesced[0]:>5} SQL {coalesced[1]:>8.1f} мс"
+        )
+        # Без объединения каждый клиент выполняет эндпоинт сам
+        per_call = plain[0] / CLIENTS
+        assert coalesced[0] <= per_call * MAX_FLIGHTS, (
+            f"{path}: с объединением {coalesced[0]} SQL, "
+            f"ожидалось не больше {per_call * MAX_FLIGHTS:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Сравнение поиска по подстроке и нечёткого поиска по триграммам
+
+Запуск: python benchmarks/fuzzy_search.py
+
+Для каждого размера каталога генерируются названия и замеряется среднее
+время одного запроса. Поиск по подстроке повторяет фильтр из
+search_organization_by_name (без загрузки строк из БД, которая в реальном
+эндпоинте добавляется сверху), нечёткий - rank_candidates по готовому индексу.
+"""
+
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from app.fuzzy import build_trigram_state, rank_candidates
+
+PREFIXES = ["ООО", "ИП", "АО", "Магазин", "Клиника", "Салон", "Центр", "Студия"]
+SYLLABLES = ["ка", "ро", "ми", "ле", "ту", "са", "ни", "во", "да", "ре", "по", "зу"]
+SEED_WORDS = [
+    "Рога",
+    "Копыта",
+    "Дент",
+    "Софт",
+    "Хлебосол",
+    "Богатырь",
+    "Ферма",
+    "Премиум",
+    "Профи",
+    "Аромат",
+    "Здоровье",
+    "Фарма",
+    "Жигули",
+    "Ломоносов",
+    "Стоматология",
+    "Автозапчасти",
+    "Молоко",
+    "Мир",
+]
+QUERIES = ["рога", "рага", "стамотология", "хлебасол", "софт", "прими"]
+SIZES = [1_000, 10_000, 100_000]
+REPEATS = 20
+
+
+def generate_names(count: int) -> list[tuple[int, str]]:
+    rng = random.Random(count)
+    # Словарь растёт вместе с каталогом, как в реальных данных
+    vocabulary = list(SEED_WORDS)
+    while len(vocabulary) < count // 4:
+        length = rng.randint(2, 4)
+        vocabulary.append("".join(rng.choices(SYLLABLES, k=length)).capitalize())
+
+    names = []
+    for org_id in range(1, count + 1):
+        words = rng.sample(vocabulary, 2)
+        suffix = rng.randint(1, 999)
+        names.append(
+            (org_id, f"{rng.choice(PREFIXES)} '{words[0]} {words[1]}' №{suffix}")
+        )
+    return names
+
+
+def substring_search(names: list[tuple[int, str]], query: str) -> list[int]:
+    search_term = query.lower()
+    return [org_id for org_id, name in names if search_term in name.lower()]
+
+
+def measure(func, *args) -> float:
+    start = perf_counter()
+    for _ in range(REPEATS):
+        func(*args)
+    return (perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    print(f"{'размер':>8} {'запрос':>14} {'подстрока, мс':>14} {'триграммы, мс':>14}")
+    for size in SIZES:
+        names = generate_names(size)
+        postings, normalized = build_trigram_state(names)
+        for query in QUERIES:
+            substring_ms = measure(substring_search, names, query)
+            fuzzy_ms = measure(rank_candidates, postings, normalized, query)
+            print(f"{size:>8} {query:>14} {substring_ms:>14.3f} {fuzzy_ms:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
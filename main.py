@@ -1,24 +1,59 @@
+from contextlib import asynccontextmanager
+from threading import Thread
+
 import uvicorn
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.compression import CompressionMiddleware
+from app.database import engine
+from app.dependencies import require_scope, verify_api_key
+from app.metrics import MetricsMiddleware, install_sql_instrumentation, registry
+from app.profiling import ProfilingMiddleware
+from app.routers import admin, buildings, businesses, changes, organizations
+from app.slow_queries import slow_query_observer
+from app.warmup import readiness, warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогрев идёт в фоне: сервис принимает запросы сразу, а балансировщик
+    # ждёт 200 от /ready
+    Thread(target=warm_up, name="warm-up", daemon=True).start()
+    yield
 
-from app.dependencies import verify_api_key
-from app.routers import buildings, businesses, organizations
 
 app = FastAPI(
     title="Organization Catalog API",
     description="Тестовое задание на должность разработчика",
     version="1.0.0",
-    dependencies=[Depends(verify_api_key)],
+    lifespan=lifespan,
 )
 
-app.include_router(organizations.router)
-app.include_router(buildings.router)
-app.include_router(businesses.router)
+# API-ключ нужен всем маршрутам, кроме служебных: /metrics и /ready читают
+# скрейпер Prometheus и пробы балансировщика, у которых ключа нет. Каталог
+# читают ключи с областью read, роутер /admin сам требует область admin
+api_key_required = [Depends(verify_api_key)]
+read_scope_required = [Depends(require_scope("read"))]
+
+# Последний добавленный middleware - внешний: метрики видят и профилирование,
+# и размер ответа после сжатия
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+install_sql_instrumentation(engine, observers=[slow_query_observer()])
+
+app.include_router(organizations.router, dependencies=read_scope_required)
+app.include_router(buildings.router, dependencies=read_scope_required)
+app.include_router(businesses.router, dependencies=read_scope_required)
+app.include_router(changes.router, dependencies=read_scope_required)
+app.include_router(admin.router, dependencies=api_key_required)
 
 
 @app.get(
     "/",
     summary="Проверка работоспособности сервиса",
+    dependencies=api_key_required,
 )
 def health_check():
     return {
@@ -29,5 +64,31 @@ def health_check():
     }
 
 
+@app.get(
+    "/ready",
+    summary="Готовность сервиса после прогрева",
+)
+def ready():
+    """200 после прогрева при запуске, до этого 503 с текущим шагом"""
+    state = readiness.snapshot()
+    if not state["ready"]:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Сервис прогревается: {state['step']}",
+        )
+    return state
+
+
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Метрики в формате Prometheus",
+)
+def metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
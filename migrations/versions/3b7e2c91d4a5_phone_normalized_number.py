@@ -0,0 +1,51 @@
+"""phone normalized number
+
+Revision ID: 3b7e2c91d4a5
+Revises: 00f6d536f2a1
+Create Date: 2026-10-19 11:20:41.512307
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e2c91d4a5'
+down_revision: Union[str, Sequence[str], None] = '00f6d536f2a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _normalize_phone(number: str) -> str:
+    # Копия app.utils.normalize_phone на момент миграции
+    digits = re.sub(r"\D", "", number)
+    if not number.lstrip().startswith("+") and digits.startswith("8"):
+        digits = "7" + digits[1:]
+    return digits
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('phone', sa.Column('normalized_number', sa.String(length=25), nullable=True))
+
+    connection = op.get_bind()
+    phones = connection.execute(sa.text('SELECT id, number FROM phone')).all()
+    if phones:
+        connection.execute(
+            sa.text('UPDATE phone SET normalized_number = :normalized WHERE id = :id'),
+            [{'id': id_, 'normalized': _normalize_phone(number)} for id_, number in phones],
+        )
+
+    with op.batch_alter_table('phone') as batch_op:
+        batch_op.alter_column('normalized_number', existing_type=sa.String(length=25), nullable=False)
+    op.create_index('idx_phone_normalized_number', 'phone', ['normalized_number'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_phone_normalized_number', table_name='phone')
+    with op.batch_alter_table('phone') as batch_op:
+        batch_op.drop_column('normalized_number')
@@ -0,0 +1,68 @@
+"""change log
+
+Revision ID: 8d41f0a6c2e7
+Revises: 3b7e2c91d4a5
+Create Date: 2026-10-19 13:05:12.847019
+
+"""
+import json
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41f0a6c2e7'
+down_revision: Union[str, Sequence[str], None] = '3b7e2c91d4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> колонки первичного ключа; порядок задаёт порядок в журнале
+TRACKED_TABLES = {
+    'building': ('id',),
+    'business': ('id',),
+    'organization': ('id',),
+    'phone': ('id',),
+    'organization_business': ('organization_id', 'business_id'),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    change_log = op.create_table('change_log',
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=32), nullable=False),
+    sa.Column('entity_id', sa.String(length=64), nullable=False),
+    sa.Column('operation', sa.String(length=8), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('seq'),
+    sqlite_autoincrement=True
+    )
+
+    # Текущее состояние попадает в журнал, чтобы синхронизация с since=0
+    # получала полный снимок каталога
+    connection = op.get_bind()
+    now = datetime.now(timezone.utc)
+    for table, key_columns in TRACKED_TABLES.items():
+        result = connection.execute(sa.text(f'SELECT * FROM {table}'))
+        columns = list(result.keys())
+        records = []
+        for row in result:
+            values = dict(zip(columns, row))
+            records.append({
+                'entity': table,
+                'entity_id': ':'.join(str(values[key]) for key in key_columns),
+                'operation': 'upsert',
+                'payload': json.dumps(values, ensure_ascii=False),
+                'changed_at': now,
+            })
+        if records:
+            op.bulk_insert(change_log, records)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('change_log')
@@ -0,0 +1,51 @@
+"""data version
+
+Revision ID: a4e8c2d6f031
+Revises: f7c1a3e5b982
+Create Date: 2026-10-20 10:12:38.604215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e8c2d6f031'
+down_revision: Union[str, Sequence[str], None] = 'f7c1a3e5b982'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия app.models.VERSIONED_TABLES на момент миграции
+VERSIONED_TABLES = ('building', 'business', 'organization', 'organization_business', 'phone')
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_version',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.bulk_insert(
+        sa.table('data_version', sa.column('table_name'), sa.column('version')),
+        [{'table_name': table, 'version': 0} for table in VERSIONED_TABLES],
+    )
+    for table in VERSIONED_TABLES:
+        for operation in OPERATIONS:
+            op.execute(
+                f"CREATE TRIGGER {table}_{operation.lower()}_version "
+                f"AFTER {operation} ON {table} BEGIN "
+                f"UPDATE data_version SET version = version + 1 "
+                f"WHERE table_name = '{table}'; END"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in VERSIONED_TABLES:
+        for operation in OPERATIONS:
+            op.execute(f"DROP TRIGGER {table}_{operation.lower()}_version")
+    op.drop_table('data_version')
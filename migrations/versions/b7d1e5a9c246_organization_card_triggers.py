@@ -0,0 +1,52 @@
+"""organization card triggers
+
+Revision ID: b7d1e5a9c246
+Revises: a4e8c2d6f031
+Create Date: 2026-10-20 11:03:52.917340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d1e5a9c246'
+down_revision: Union[str, Sequence[str], None] = 'a4e8c2d6f031'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия app.models.CARD_SOURCES на момент миграции
+CARD_SOURCES = (
+    ('organization', 'AFTER UPDATE', 'OLD.id'),
+    ('organization', 'AFTER DELETE', 'OLD.id'),
+    ('phone', 'AFTER INSERT', 'NEW.organization_id'),
+    ('phone', 'AFTER UPDATE', 'OLD.organization_id, NEW.organization_id'),
+    ('phone', 'AFTER DELETE', 'OLD.organization_id'),
+    ('organization_business', 'AFTER INSERT', 'NEW.organization_id'),
+    ('organization_business', 'AFTER UPDATE', 'OLD.organization_id, NEW.organization_id'),
+    ('organization_business', 'AFTER DELETE', 'OLD.organization_id'),
+    ('building', 'AFTER UPDATE', 'SELECT id FROM organization WHERE building_id = OLD.id'),
+    ('business', 'AFTER UPDATE', 'SELECT organization_id FROM organization_business WHERE business_id = OLD.id'),
+    ('business', 'BEFORE DELETE', 'SELECT organization_id FROM organization_business WHERE business_id = OLD.id'),
+)
+
+
+def _trigger_name(table: str, timing: str) -> str:
+    return f"{table}_{timing.split()[1].lower()}_card"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, timing, org_ids in CARD_SOURCES:
+        op.execute(
+            f"CREATE TRIGGER {_trigger_name(table, timing)} {timing} ON {table} BEGIN "
+            f"DELETE FROM organization_card WHERE organization_id IN ({org_ids}); END"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, timing, _ in CARD_SOURCES:
+        op.execute(f"DROP TRIGGER {_trigger_name(table, timing)}")
@@ -0,0 +1,94 @@
+"""organization card
+
+Revision ID: c5a9e3f7b210
+Revises: 8d41f0a6c2e7
+Create Date: 2026-10-19 15:42:03.218664
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9e3f7b210'
+down_revision: Union[str, Sequence[str], None] = '8d41f0a6c2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHUNK = 500
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _select_in(sql: str):
+    return sa.text(sql).bindparams(sa.bindparam('ids', expanding=True))
+
+
+# Копия app.cards.render_cards на момент миграции: JSON OrganizationResponse
+# строится запросами к таблицам, без моделей и схем приложения
+def render_cards(connection, org_ids) -> dict[int, bytes]:
+    params = {'ids': list(org_ids)}
+    phones, businesses = {}, {}
+    for org_id, number in connection.execute(_select_in(
+        'SELECT organization_id, number FROM phone '
+        'WHERE organization_id IN :ids ORDER BY id'
+    ), params):
+        phones.setdefault(org_id, []).append({'number': number})
+    for org_id, id_, name, parent_id in connection.execute(_select_in(
+        'SELECT ob.organization_id, b.id, b.name, b.parent_id '
+        'FROM organization_business AS ob JOIN business AS b ON b.id = ob.business_id '
+        'WHERE ob.organization_id IN :ids ORDER BY ob.organization_id, b.id'
+    ), params):
+        businesses.setdefault(org_id, []).append({'id': id_, 'name': name, 'parent_id': parent_id})
+
+    cards = {}
+    for org_id, name, building_id, address, lat, lon in connection.execute(_select_in(
+        'SELECT o.id, o.name, b.id, b.address, b.latitude, b.longitude '
+        'FROM organization AS o JOIN building AS b ON b.id = o.building_id '
+        'WHERE o.id IN :ids'
+    ), params):
+        cards[org_id] = _dumps({
+            'id': org_id,
+            'name': name,
+            'phones': phones.get(org_id, []),
+            'businesses': businesses.get(org_id, []),
+            'building': {
+                'id': building_id,
+                'address': address,
+                'latitude': float(lat),
+                'longitude': float(lon),
+            },
+        })
+    return cards
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('organization_card',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organization.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('organization_id')
+    )
+
+    # Карточки существующих организаций строятся здесь, чтобы чтения API
+    # ничего не записывали
+    connection = op.get_bind()
+    org_ids = [id_ for (id_,) in connection.execute(sa.text('SELECT id FROM organization'))]
+    card = sa.table('organization_card', sa.column('organization_id'), sa.column('payload'))
+    for start in range(0, len(org_ids), BACKFILL_CHUNK):
+        cards = render_cards(connection, org_ids[start:start + BACKFILL_CHUNK])
+        if cards:
+            op.bulk_insert(card, [
+                {'organization_id': id_, 'payload': payload}
+                for id_, payload in cards.items()
+            ])
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('organization_card')
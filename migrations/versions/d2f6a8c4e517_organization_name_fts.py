@@ -0,0 +1,50 @@
+"""organization name fts
+
+Revision ID: d2f6a8c4e517
+Revises: b7d1e5a9c246
+Create Date: 2026-10-20 12:27:14.381506
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6a8c4e517'
+down_revision: Union[str, Sequence[str], None] = 'b7d1e5a9c246'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "CREATE VIRTUAL TABLE organization_name_fts USING fts5("
+        "name, content='organization', content_rowid='id', tokenize='trigram')"
+    )
+    op.execute(
+        "CREATE TRIGGER organization_insert_name_fts AFTER INSERT ON organization BEGIN "
+        "INSERT INTO organization_name_fts (rowid, name) VALUES (NEW.id, NEW.name); END"
+    )
+    op.execute(
+        "CREATE TRIGGER organization_delete_name_fts AFTER DELETE ON organization BEGIN "
+        "INSERT INTO organization_name_fts (organization_name_fts, rowid, name) "
+        "VALUES ('delete', OLD.id, OLD.name); END"
+    )
+    op.execute(
+        "CREATE TRIGGER organization_update_name_fts AFTER UPDATE OF id, name ON organization BEGIN "
+        "INSERT INTO organization_name_fts (organization_name_fts, rowid, name) "
+        "VALUES ('delete', OLD.id, OLD.name); "
+        "INSERT INTO organization_name_fts (rowid, name) VALUES (NEW.id, NEW.name); END"
+    )
+    op.execute("INSERT INTO organization_name_fts (organization_name_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER organization_update_name_fts")
+    op.execute("DROP TRIGGER organization_delete_name_fts")
+    op.execute("DROP TRIGGER organization_insert_name_fts")
+    op.execute("DROP TABLE organization_name_fts")
@@ -0,0 +1,41 @@
+"""api key
+
+Revision ID: e2b4d6f8a913
+Revises: c5a9e3f7b210
+Create Date: 2026-10-19 18:05:41.730519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b4d6f8a913'
+down_revision: Union[str, Sequence[str], None] = 'c5a9e3f7b210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('api_key',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('key_hash', sa.String(length=64), nullable=False),
+    sa.Column('scopes', sa.String(length=255), nullable=False),
+    sa.Column('rate_per_second', sa.Float(), nullable=True),
+    sa.Column('burst', sa.Integer(), nullable=True),
+    sa.Column('max_concurrent', sa.Integer(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key_hash'),
+    sa.UniqueConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('api_key')
@@ -0,0 +1,67 @@
+"""change log triggers
+
+Revision ID: e8c3a5f1d724
+Revises: d2f6a8c4e517
+Create Date: 2026-10-20 14:41:06.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c3a5f1d724'
+down_revision: Union[str, Sequence[str], None] = 'd2f6a8c4e517'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия колонок таблиц каталога на момент миграции: (ключ, все колонки)
+TRACKED_TABLES = {
+    'building': (('id',), ('id', 'address', 'latitude', 'longitude')),
+    'business': (('id',), ('id', 'name', 'parent_id')),
+    'organization': (('id',), ('id', 'name', 'building_id')),
+    'organization_business': (('organization_id', 'business_id'), ('organization_id', 'business_id')),
+    'phone': (('id',), ('id', 'number', 'normalized_number', 'organization_id')),
+}
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+# Копия app.models._change_log_insert на момент миграции
+def _change_log_insert(table_name, keys, row, operation, names):
+    entity_id = " || ':' || ".join(f"{row}.{key}" for key in keys)
+    payload = ", ".join(f"'{name}', {row}.{name}" for name in names)
+    return (
+        "INSERT INTO change_log (entity, entity_id, operation, payload, changed_at) "
+        f"SELECT '{table_name}', {entity_id}, '{operation}', json_object({payload}), "
+        "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table_name, (keys, columns) in TRACKED_TABLES.items():
+        key_changed = " OR ".join(f"OLD.{key} IS NOT NEW.{key}" for key in keys)
+        bodies = {
+            'INSERT': [_change_log_insert(table_name, keys, 'NEW', 'upsert', columns)],
+            'UPDATE': [
+                _change_log_insert(table_name, keys, 'OLD', 'delete', keys) + f" WHERE {key_changed}",
+                _change_log_insert(table_name, keys, 'NEW', 'upsert', columns),
+            ],
+            'DELETE': [_change_log_insert(table_name, keys, 'OLD', 'delete', keys)],
+        }
+        for operation, inserts in bodies.items():
+            op.execute(
+                f"CREATE TRIGGER {table_name}_{operation.lower()}_change "
+                f"AFTER {operation} ON {table_name} BEGIN "
+                + "".join(f"{insert}; " for insert in inserts)
+                + "END"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in TRACKED_TABLES:
+        for operation in OPERATIONS:
+            op.execute(f"DROP TRIGGER {table_name}_{operation.lower()}_change")
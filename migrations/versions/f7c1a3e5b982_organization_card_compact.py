@@ -0,0 +1,86 @@
+"""organization card compact
+
+Revision ID: f7c1a3e5b982
+Revises: e2b4d6f8a913
+Create Date: 2026-10-19 19:24:17.402851
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c1a3e5b982'
+down_revision: Union[str, Sequence[str], None] = 'e2b4d6f8a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHUNK = 500
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _select_in(sql: str):
+    return sa.text(sql).bindparams(sa.bindparam('ids', expanding=True))
+
+
+# Копия app.cards.render_cards на момент миграции: JSON
+# NormalizedOrganizationResponse строится запросами к таблицам, без моделей
+# и схем приложения
+def render_compact(connection, org_ids) -> dict[int, bytes]:
+    params = {'ids': list(org_ids)}
+    phones, business_ids = {}, {}
+    for org_id, number in connection.execute(_select_in(
+        'SELECT organization_id, number FROM phone '
+        'WHERE organization_id IN :ids ORDER BY id'
+    ), params):
+        phones.setdefault(org_id, []).append({'number': number})
+    for org_id, business_id in connection.execute(_select_in(
+        'SELECT organization_id, business_id FROM organization_business '
+        'WHERE organization_id IN :ids ORDER BY organization_id, business_id'
+    ), params):
+        business_ids.setdefault(org_id, []).append(business_id)
+
+    cards = {}
+    for org_id, name, building_id in connection.execute(_select_in(
+        'SELECT o.id, o.name, o.building_id '
+        'FROM organization AS o JOIN building AS b ON b.id = o.building_id '
+        'WHERE o.id IN :ids'
+    ), params):
+        cards[org_id] = _dumps({
+            'id': org_id,
+            'name': name,
+            'phones': phones.get(org_id, []),
+            'building_id': building_id,
+            'business_ids': business_ids.get(org_id, []),
+        })
+    return cards
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('organization_card', sa.Column('compact', sa.LargeBinary(), nullable=True))
+
+    # compact существующих карточек строится здесь, как и сами карточки
+    # в c5a9e3f7b210: чтения API ничего не записывают
+    connection = op.get_bind()
+    org_ids = [
+        id_ for (id_,) in connection.execute(sa.text('SELECT organization_id FROM organization_card'))
+    ]
+    for start in range(0, len(org_ids), BACKFILL_CHUNK):
+        cards = render_compact(connection, org_ids[start:start + BACKFILL_CHUNK])
+        if cards:
+            connection.execute(
+                sa.text('UPDATE organization_card SET compact = :compact WHERE organization_id = :id'),
+                [{'id': id_, 'compact': compact} for id_, compact in cards.items()],
+            )
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('organization_card') as batch_op:
+        batch_op.drop_column('compact')
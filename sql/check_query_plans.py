@@ -0,0 +1,264 @@
+"""Проверка планов SQL-запросов всех эндпоинтов на большом каталоге
+
+Запуск: python sql/check_query_plans.py
+
+Во временной БД генерируется каталог. После прогрева приложения (/ready)
+каждый эндпоинт вызывается дважды: первый вызов прогревает in-memory
+индексы, во втором перехватываются SQL-запросы. Для каждого SELECT
+выполняется EXPLAIN QUERY PLAN. Проверка завершается с кодом 1, если
+эндпоинт ответил не ожидаемым статусом, запрос читает таблицу целиком,
+эндпоинт выполняет больше запросов, чем заложено в бюджете, или для
+GET-маршрута нет проверки.
+"""
+
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+from time import monotonic, sleep
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+os.environ["API_KEY"] = "query-plan-check"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+
+from app.cards import write_cards
+from app.database import Base, SessionLocal, register_sqlite_functions
+from app.models import Building, Business, Organization, OrganizationBusiness, Phone
+from app.utils import full_scans, normalize_phone
+from main import app
+
+BUILDINGS = 5_000
+ORGANIZATIONS = 50_000
+# Дерево видов деятельности: корни, их дети и внуки
+BUSINESS_TREE = (10, 5, 4)
+CARD_CHUNK = 1_000
+
+PREFIXES = ["ООО", "ИП", "АО", "Магазин", "Клиника", "Салон", "Центр", "Студия"]
+SYLLABLES = ["ка", "ро", "ми", "ле", "ту", "са", "ни", "во", "да", "ре", "по", "зу"]
+
+# Путь, допустимое число SQL-запросов после прогрева и ожидаемый статус ответа
+# (по умолчанию 200). Эндпоинты на in-memory индексах делают один запрос
+# к data_version, чтобы проверить их актуальность; автодополнение сверяется
+# не чаще раза в полсекунды, и повторный запрос отвечает из памяти
+CASES = [
+    ("/", 0),
+    ("/metrics", 0),
+    ("/ready", 0),
+    ("/organizations/1", 1),
+    ("/organizations/batch?ids=1&ids=2&ids=3", 1),
+    ("/organizations/building/1", 3),
+    ("/organizations/building/1?format=normalized", 5),
+    ("/organizations/business/20", 3),
+    ("/organizations/nearby?lat=55.75&lon=37.62&radius=1000", 3),
+    ("/organizations/nearby?lat=55.75&lon=37.62&radius=1000&shape=square", 3),
+    ("/organizations/search?name=Рокаса", 2),
+    ("/organizations/search?name=ро", 3),
+    ("/organizations/search?name=Ракаса&mode=fuzzy", 2),
+    ("/organizations/suggest?q=ро", 0),
+    ("/organizations/by-phone?number=8 (495) 100-00-01", 2),
+    ("/organizations/by-phone?number=%2B7495100&prefix=true", 2),
+    ("/organizations/filter?business_id=1", 2),
+    ("/organizations/filter?business_id=20&include_subtree=false", 2),
+    ("/organizations/filter?building_id=1&name=ро", 2),
+    ("/organizations/filter?name=Рокаса", 2),
+    ("/organizations/filter?lat=55.75&lon=37.62&radius=1000&business_id=1", 2),
+    ("/buildings/nearby?lat=55.75&lon=37.62&radius=1000", 1),
+    ("/buildings/stats?lat=55.75&lon=37.62&radius=1000", 1),
+    ("/businesses/1/organizations", 3),
+    ("/businesses/1/organizations?format=normalized", 5),
+    ("/businesses/stats?name=ро", 1),
+    ("/changes?since=0", 1),
+    ("/admin/api-keys", 0),
+    ("/admin/slow-queries", 0),
+    ("/admin/profiles", 0),
+    ("/admin/profiles/1", 0, 404),
+]
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).capitalize()
+
+
+def generate_catalog(engine) -> None:
+    rng = random.Random(36)
+    Base.metadata.create_all(engine)
+
+    buildings = [
+        {
+            "id": building_id,
+            "address": f"ул. {random_word(rng)}, {building_id}",
+            "latitude": round(rng.uniform(55.55, 55.95), 6),
+            "longitude": round(rng.uniform(37.35, 37.85), 6),
+        }
+        for building_id in range(1, BUILDINGS + 1)
+    ]
+
+    businesses = []
+    parents = [None]
+    for width in BUSINESS_TREE:
+        level = []
+        for parent_id in parents:
+            for _ in range(width):
+                business_id = len(businesses) + 1
+                businesses.append(
+                    {
+                        "id": business_id,
+                        "name": f"{random_word(rng)} {business_id}",
+                        "parent_id": parent_id,
+                    }
+                )
+                level.append(business_id)
+        parents = level
+
+    organizations, phones, links = [], [], []
+    for org_id in range(1, ORGANIZATIONS + 1):
+        organizations.append(
+            {
+                "id": org_id,
+                "name": f"{rng.choice(PREFIXES)} '{random_word(rng)} "
+                f"{random_word(rng)}'",
+                "building_id": rng.randint(1, BUILDINGS),
+            }
+        )
+        for _ in range(rng.randint(1, 3)):
+            number = (
+                f"8 (495) {100 + len(phones) // 10000:03d}-{len(phones) % 10000:04d}"
+            )
+            phones.append(
+                {
+                    "number": number,
+                    "normalized_number": normalize_phone(number),
+                    "organization_id": org_id,
+                }
+            )
+        for business_id in rng.sample(range(1, len(businesses) + 1), 2):
+            links.append({"organization_id": org_id, "business_id": business_id})
+
+    with engine.begin() as conn:
+        conn.execute(insert(Building), buildings)
+        conn.execute(insert(Business), businesses)
+        conn.execute(insert(Organization), organizations)
+        conn.execute(insert(Phone), phones)
+        conn.execute(insert(OrganizationBusiness), links)
+
+    db = SessionLocal()
+    try:
+        for start in range(1, ORGANIZATIONS + 1, CARD_CHUNK):
+            write_cards(
+                db, list(range(start, min(start + CARD_CHUNK, ORGANIZATIONS + 1)))
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+def explain(engine, statement: str, parameters) -> list[str]:
+    connection = engine.raw_connection()
+    try:
+        rows = connection.execute(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        ).fetchall()
+    finally:
+        connection.close()
+    return [row[-1] for row in rows]
+
+
+def check_case(
+    client, engine, captured: list, path: str, budget: int, status: int = 200
+) -> list[str]:
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    client.get(path, headers=headers)
+
+    captured.clear()
+    response = client.get(path, headers=headers)
+    statements = list(captured)
+
+    problems = []
+    if response.status_code != status:
+        # Ответ с ошибкой (403, 422 из-за опечатки в пути) обычно не доходит
+        # до БД, и бюджет с планами проверялись бы впустую
+        problems.append(f"ответ {response.status_code}, ожидался {status}")
+    if len(statements) > budget:
+        problems.append(f"{len(statements)} SQL-запросов при бюджете {budget}")
+
+    for statement, parameters in statements:
+        if statement.split(None, 1)[0].upper() not in ("SELECT", "WITH"):
+            problems.append(f"запись в БД при чтении: {statement}")
+            continue
+        plan = explain(engine, statement, parameters)
+        scanned = full_scans(plan)
+        if scanned:
+            problems.append(
+                f"полное сканирование {', '.join(scanned)}: {statement}\n"
+                + "\n".join(f"      {line}" for line in plan)
+            )
+
+    mark = "FAIL" if problems else "ok"
+    print(f"{mark:>4} {len(statements):>2}/{budget:<2} {path}")
+    for problem in problems:
+        print(f"       {problem}")
+    return problems
+
+
+def wait_ready(client, timeout: float = 120.0) -> None:
+    """Ждёт окончания прогрева, чтобы его запросы не попали в проверку"""
+    # /ready опрашивается без ключа, как это делает проба балансировщика
+    deadline = monotonic() + timeout
+    while client.get("/ready").status_code != 200:
+        if monotonic() > deadline:
+            raise RuntimeError("Сервис не прогрелся за отведённое время")
+        sleep(0.1)
+
+
+def uncovered_routes() -> list[str]:
+    checked = {path.split("?")[0] for path, *_ in CASES}
+    routes = []
+    for route in app.routes:
+        if "GET" not in getattr(route, "methods", ()) or not route.include_in_schema:
+            continue
+        if not any(route.path_regex.match(path) for path in checked):
+            routes.append(route.path)
+    return routes
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(
+            f"sqlite:///{tmp_dir}/plans.db",
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(engine, "connect", register_sqlite_functions)
+        SessionLocal.configure(bind=engine)
+
+        print(f"Генерация каталога: {ORGANIZATIONS} организаций, {BUILDINGS} зданий")
+        generate_catalog(engine)
+
+        captured = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            captured.append((statement, parameters))
+
+        failed = 0
+        with TestClient(app) as client:
+            wait_ready(client)
+            for case in CASES:
+                failed += bool(check_case(client, engine, captured, *case))
+
+        for path in uncovered_routes():
+            print(f"FAIL нет проверки для GET {path}")
+            failed += 1
+
+        engine.dispose()
+
+    print(f"\nПроблемных эндпоинтов: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
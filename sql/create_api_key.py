@@ -0,0 +1,66 @@
+"""Создание API-ключа
+
+Запуск: python sql/create_api_key.py partner --scopes read --rate 10 --burst 20
+
+Ключ печатается один раз, в БД сохраняется только его SHA-256. Приложение
+подхватывает новый ключ в течение API_KEY_CACHE_TTL секунд.
+"""
+
+import argparse
+import secrets
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from app.api_keys import SCOPES, hash_key
+from app.database import SessionLocal
+from app.models import ApiKey
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Создание API-ключа")
+    parser.add_argument("name", help="Имя ключа, например название клиента")
+    parser.add_argument(
+        "--scopes", nargs="+", choices=SCOPES, default=["read"], help="Области доступа"
+    )
+    parser.add_argument("--rate", type=float, help="Запросов в секунду в среднем")
+    parser.add_argument("--burst", type=int, help="Запросов подряд без ожидания")
+    parser.add_argument(
+        "--concurrency", type=int, help="Одновременных запросов не больше"
+    )
+    return parser.parse_args()
+
+
+def create_api_key():
+    args = parse_args()
+    api_key = secrets.token_urlsafe(32)
+
+    db = SessionLocal()
+    try:
+        if db.query(ApiKey).filter(ApiKey.name == args.name).count():
+            sys.exit(f"Ключ с именем {args.name} уже существует")
+
+        db.add(
+            ApiKey(
+                name=args.name,
+                key_hash=hash_key(api_key),
+                scopes=" ".join(args.scopes),
+                rate_per_second=args.rate,
+                burst=args.burst,
+                max_concurrent=args.concurrency,
+                is_active=True,
+                created_at=datetime.now(timezone.utc),
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"Ключ {args.name} ({' '.join(args.scopes)}): {api_key}")
+
+
+if __name__ == "__main__":
+    create_api_key()
@@ -16,6 +16,7 @@ CREATE TABLE organization (
 CREATE TABLE phone (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     number VARCHAR(25) NOT NULL,
+    normalized_number VARCHAR(25) NOT NULL,
     organization_id INTEGER NOT NULL REFERENCES organization(id) ON DELETE CASCADE,
     UNIQUE(number, organization_id)
 );
@@ -33,11 +34,84 @@ CREATE TABLE organization_business (
     PRIMARY KEY (organization_id, business_id)
 );
 
+-- Готовый JSON организации для чтения одним запросом по ключу
+CREATE TABLE organization_card (
+    organization_id INTEGER PRIMARY KEY REFERENCES organization(id) ON DELETE CASCADE,
+    payload BLOB NOT NULL,
+    compact BLOB
+);
+
+-- Журнал изменений для инкрементальной синхронизации
+CREATE TABLE change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity VARCHAR(32) NOT NULL,
+    entity_id VARCHAR(64) NOT NULL,
+    operation VARCHAR(8) NOT NULL,
+    payload TEXT NOT NULL,
+    changed_at DATETIME NOT NULL
+);
+
+-- API-ключи: хранится только SHA-256 ключа
+CREATE TABLE api_key (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    key_hash VARCHAR(64) NOT NULL UNIQUE,
+    scopes VARCHAR(255) NOT NULL,
+    rate_per_second FLOAT,
+    burst INTEGER,
+    max_concurrent INTEGER,
+    is_active BOOLEAN NOT NULL,
+    created_at DATETIME NOT NULL
+);
+
+-- Версии таблиц каталога для проверки актуальности in-memory индексов
+CREATE TABLE data_version (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+INSERT INTO data_version (table_name, version) VALUES
+    ('building', 0), ('business', 0), ('organization', 0),
+    ('organization_business', 0), ('phone', 0);
+
 -- Индексы
 CREATE INDEX idx_organization_building ON organization(building_id);
 CREATE INDEX idx_phone_number ON phone(number);
+CREATE INDEX idx_phone_normalized_number ON phone(normalized_number);
 CREATE INDEX idx_phone_organization ON phone(organization_id);
 CREATE INDEX idx_business_parent ON business(parent_id);
 CREATE INDEX idx_org_business_org ON organization_business(organization_id);
 CREATE INDEX idx_org_business_business ON organization_business(business_id);
 CREATE INDEX idx_building_coords ON building(latitude, longitude);
+
+-- Любая запись в таблицу каталога увеличивает её версию
+-- (такие же триггеры для UPDATE и DELETE и для business, organization,
+-- organization_business, phone)
+CREATE TRIGGER building_insert_version AFTER INSERT ON building BEGIN
+    UPDATE data_version SET version = version + 1 WHERE table_name = 'building';
+END;
+
+-- Запись в обход ORM удаляет карточки затронутых организаций (такие же
+-- триггеры для phone, organization_business, building и business)
+CREATE TRIGGER organization_update_card AFTER UPDATE ON organization BEGIN
+    DELETE FROM organization_card WHERE organization_id IN (OLD.id);
+END;
+
+-- Поиск по подстроке названия: FTS5-индекс триграмм, его ведут триггеры
+-- (такие же для DELETE и UPDATE OF id, name)
+CREATE VIRTUAL TABLE organization_name_fts USING fts5(
+    name, content='organization', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER organization_insert_name_fts AFTER INSERT ON organization BEGIN
+    INSERT INTO organization_name_fts (rowid, name) VALUES (NEW.id, NEW.name);
+END;
+
+-- Любая запись в таблицу каталога попадает в change_log: upsert со строкой
+-- целиком, delete с ключом (такие же триггеры для UPDATE и DELETE и для
+-- building, business, organization_business, phone)
+CREATE TRIGGER organization_insert_change AFTER INSERT ON organization BEGIN
+    INSERT INTO change_log (entity, entity_id, operation, payload, changed_at)
+    SELECT 'organization', NEW.id, 'upsert',
+        json_object('id', NEW.id, 'name', NEW.name, 'building_id', NEW.building_id),
+        strftime('%Y-%m-%d %H:%M:%f', 'now');
+END;
@@ -4,6 +4,8 @@ from pathlib import Path
 root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
 
+# Обработчики сессии: карточки организаций
+import app.cards  # noqa: F401
 from app.database import Base, SessionLocal, engine
 from app.models import (
     Building,